@@ -7,7 +7,6 @@ from geniusweb.actions.Accept import Accept
 from geniusweb.actions.Action import Action
 from geniusweb.actions.Offer import Offer
 from geniusweb.actions.PartyId import PartyId
-from geniusweb.bidspace.AllBidsList import AllBidsList
 from geniusweb.inform.ActionDone import ActionDone
 from geniusweb.inform.Finished import Finished
 from geniusweb.inform.Inform import Inform
@@ -27,6 +26,8 @@ from geniusweb.progress.ProgressTime import ProgressTime
 from geniusweb.references.Parameters import Parameters
 from tudelft_utilities_logging.ReportToLogger import ReportToLogger
 
+from agents.utils.descending_bids import DescendingBids
+
 #from agents.template_agent.utils.opponent_model import OpponentModel
 
 
@@ -87,11 +88,9 @@ class MiCROAgent(DefaultParty):
             profile_connection.close()
             
          
-            #Create a sorted list containing all possible bids.
-            domain = self.profile.getDomain()
-            all_bids = AllBidsList(domain)
-            self.allMyBidsSorted = list(all_bids)
-            self.allMyBidsSorted.sort(reverse=True,key=self.profile.getUtility) 
+            #Create a sorted list containing all possible bids. The bids are only
+            #enumerated (in order of decreasing utility) as far as they are used.
+            self.allMyBidsSorted = DescendingBids(self.profile)
             
             #Test that it is sorted correctly.
             #for bid in self.allMyBidsSorted:
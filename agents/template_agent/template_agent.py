@@ -1,13 +1,13 @@
 import logging
-from random import randint
 from time import time
 from typing import cast
 
+import numpy as np
+
 from geniusweb.actions.Accept import Accept
 from geniusweb.actions.Action import Action
 from geniusweb.actions.Offer import Offer
 from geniusweb.actions.PartyId import PartyId
-from geniusweb.bidspace.AllBidsList import AllBidsList
 from geniusweb.inform.ActionDone import ActionDone
 from geniusweb.inform.Finished import Finished
 from geniusweb.inform.Inform import Inform
@@ -27,6 +27,7 @@ from geniusweb.progress.ProgressTime import ProgressTime
 from geniusweb.references.Parameters import Parameters
 from tudelft_utilities_logging.ReportToLogger import ReportToLogger
 
+from ..utils.compiled_utility_space import CompiledUtilitySpace
 from .utils.opponent_model import OpponentModel
 
 
@@ -42,6 +43,7 @@ class TemplateAgent(DefaultParty):
         self.domain: Domain = None
         self.parameters: Parameters = None
         self.profile: LinearAdditiveUtilitySpace = None
+        self.utility_space: CompiledUtilitySpace = None
         self.progress: ProgressTime = None
         self.me: PartyId = None
         self.other: str = None
@@ -81,6 +83,9 @@ class TemplateAgent(DefaultParty):
             self.domain = self.profile.getDomain()
             profile_connection.close()
 
+            # float version of the profile for fast evaluation of many bids
+            self.utility_space = CompiledUtilitySpace(self.profile)
+
         # ActionDone informs you of an action (an offer or an accept)
         # that is performed by one of the agents (including yourself).
         elif isinstance(data, ActionDone):
@@ -202,20 +207,18 @@ class TemplateAgent(DefaultParty):
         ]
         return all(conditions)
 
-    def find_bid(self) -> Bid:
-        # compose a list of all possible bids
-        domain = self.profile.getDomain()
-        all_bids = AllBidsList(domain)
-
-        best_bid_score = 0.0
-        best_bid = None
+    def find_bid(self, num_candidates: int = 500) -> Bid:
+        # draw random candidate bids as value indices (uniform over all possible bids)
+        bid_matrix = np.column_stack(
+            [
+                np.random.randint(len(values), size=num_candidates)
+                for values in self.utility_space.values
+            ]
+        )
 
-        # take 500 attempts to find a bid according to a heuristic score
-        for _ in range(500):
-            bid = all_bids.get(randint(0, all_bids.size() - 1))
-            bid_score = self.score_bid(bid)
-            if bid_score > best_bid_score:
-                best_bid_score, best_bid = bid_score, bid
+        # score all candidates at once according to a heuristic and take the best
+        bid_scores = self.score_bids(bid_matrix)
+        best_bid = self.utility_space.decode(bid_matrix[np.argmax(bid_scores)])
 
         return best_bid
 
@@ -234,7 +237,7 @@ class TemplateAgent(DefaultParty):
         """
         progress = self.progress.get(time() * 1000)
 
-        our_utility = float(self.profile.getUtility(bid))
+        our_utility = self.utility_space.utility(bid)
 
         time_pressure = 1.0 - progress ** (1 / eps)
         score = alpha * time_pressure * our_utility
@@ -245,3 +248,32 @@ class TemplateAgent(DefaultParty):
             score += opponent_score
 
         return score
+
+    def score_bids(
+        self, bid_matrix: np.ndarray, alpha: float = 0.95, eps: float = 0.1
+    ) -> np.ndarray:
+        """Calculate the heuristic score of `score_bid` for many bids at once
+
+        Args:
+            bid_matrix (np.ndarray): bids encoded as value indices, see
+                `CompiledUtilitySpace.encode_many`
+            alpha (float, optional): see `score_bid`. Defaults to 0.95.
+            eps (float, optional): see `score_bid`. Defaults to 0.1.
+
+        Returns:
+            np.ndarray: score of every bid
+        """
+        progress = self.progress.get(time() * 1000)
+
+        our_utilities = self.utility_space.utilities(bid_matrix)
+
+        time_pressure = 1.0 - progress ** (1 / eps)
+        scores = alpha * time_pressure * our_utilities
+
+        if self.opponent_model is not None:
+            opponent_utilities = self.opponent_model.predict_many(
+                bid_matrix, self.utility_space.issues
+            )
+            scores += (1.0 - alpha * time_pressure) * opponent_utilities
+
+        return scores
@@ -1,5 +1,6 @@
-from collections import defaultdict
+from typing import List
 
+import numpy as np
 from geniusweb.issuevalue.Bid import Bid
 from geniusweb.issuevalue.DiscreteValueSet import DiscreteValueSet
 from geniusweb.issuevalue.Domain import Domain
@@ -14,6 +15,10 @@ class OpponentModel:
         self.issue_estimators = {
             i: IssueEstimator(v) for i, v in domain.getIssuesValues().items()
         }
+        self.issues = list(self.issue_estimators.keys())
+
+        # normalised issue weights, recalculated after an update when they are needed
+        self._issue_weights = None
 
     def update(self, bid: Bid):
         # keep track of all bids received
@@ -23,38 +28,80 @@ class OpponentModel:
         for issue_id, issue_estimator in self.issue_estimators.items():
             issue_estimator.update(bid.getValue(issue_id))
 
+        self._issue_weights = None
+
+    def get_issue_weights(self) -> List[float]:
+        if self._issue_weights is None:
+            issue_weights = [e.weight for e in self.issue_estimators.values()]
+            total_issue_weight = 0.0
+            for issue_weight in issue_weights:
+                total_issue_weight += issue_weight
+
+            # normalise the issue weights such that the sum is 1.0
+            if total_issue_weight == 0.0:
+                self._issue_weights = [1 / len(issue_weights) for _ in issue_weights]
+            else:
+                self._issue_weights = [iw / total_issue_weight for iw in issue_weights]
+
+        return self._issue_weights
+
     def get_predicted_utility(self, bid: Bid):
         if len(self.offers) == 0 or bid is None:
             return 0
 
-        # initiate
-        total_issue_weight = 0.0
-        value_utilities = []
-        issue_weights = []
-
-        for issue_id, issue_estimator in self.issue_estimators.items():
-            # get the value that is set for this issue in the bid
+        # calculate predicted utility by multiplying all value utilities with their issue weight
+        predicted_utility = 0
+        for issue_weight, (issue_id, issue_estimator) in zip(
+            self.get_issue_weights(), self.issue_estimators.items()
+        ):
             value: Value = bid.getValue(issue_id)
+            predicted_utility += issue_weight * issue_estimator.get_value_utility(value)
 
-            # collect both the predicted weight for the issue and
-            # predicted utility of the value within this issue
-            value_utilities.append(issue_estimator.get_value_utility(value))
-            issue_weights.append(issue_estimator.weight)
+        return predicted_utility
 
-            total_issue_weight += issue_estimator.weight
+    def encode(self, bids: List[Bid]) -> np.ndarray:
+        """Encode bids as a matrix of value indices, see `predict_many`.
 
-        # normalise the issue weights such that the sum is 1.0
-        if total_issue_weight == 0.0:
-            issue_weights = [1 / len(issue_weights) for _ in issue_weights]
-        else:
-            issue_weights = [iw / total_issue_weight for iw in issue_weights]
+        Args:
+            bids (list[Bid]): bids with a value for every issue
 
-        # calculate predicted utility by multiplying all value utilities with their issue weight
-        predicted_utility = sum(
-            [iw * vu for iw, vu in zip(issue_weights, value_utilities)]
-        )
+        Returns:
+            np.ndarray: integer matrix of shape (number of bids, number of issues)
+        """
+        bid_matrix = np.empty((len(bids), len(self.issues)), dtype=np.int32)
+        for i, (issue_id, issue_estimator) in enumerate(self.issue_estimators.items()):
+            value_indices = issue_estimator.value_indices
+            bid_matrix[:, i] = [value_indices[bid.getValue(issue_id)] for bid in bids]
 
-        return predicted_utility
+        return bid_matrix
+
+    def predict_many(self, bid_matrix: np.ndarray, issues: List[str] = None) -> np.ndarray:
+        """Predicted utilities of many bids at once, identical to `get_predicted_utility`.
+
+        Args:
+            bid_matrix (np.ndarray): integer matrix of value indices, the values of an
+                issue are indexed in the order of its DiscreteValueSet
+            issues (list[str], optional): issue of every column of the bid matrix.
+                Defaults to None, which uses the order of `issues`.
+
+        Returns:
+            np.ndarray: predicted utility of every bid
+        """
+        predicted_utilities = np.zeros(len(bid_matrix))
+        if len(self.offers) == 0:
+            return predicted_utilities
+
+        if issues is None:
+            columns = range(len(self.issues))
+        else:
+            columns = [issues.index(issue) for issue in self.issues]
+        for issue_weight, issue_estimator, column in zip(
+            self.get_issue_weights(), self.issue_estimators.values(), columns
+        ):
+            value_utilities = issue_estimator.get_value_utilities()
+            predicted_utilities += issue_weight * value_utilities[bid_matrix[:, column]]
+
+        return predicted_utilities
 
 
 class IssueEstimator:
@@ -67,20 +114,24 @@ class IssueEstimator:
         self.bids_received = 0
         self.max_value_count = 0
         self.num_values = value_set.size()
-        self.value_trackers = defaultdict(ValueEstimator)
+        self.value_indices = {v: j for j, v in enumerate(value_set.getValues())}
+        self.value_counts = np.zeros(len(self.value_indices), dtype=np.int64)
         self.weight = 0
 
+        # utilities of the values, recalculated after an update when they are needed
+        self._value_utilities = None
+
     def update(self, value: Value):
         self.bids_received += 1
 
-        # get the value tracker of the value that is offered
-        value_tracker = self.value_trackers[value]
-
         # register that this value was offered
-        value_tracker.update()
+        value_index = self.value_indices[value]
+        self.value_counts[value_index] += 1
 
         # update the count of the most common offered value
-        self.max_value_count = max([value_tracker.count, self.max_value_count])
+        self.max_value_count = max(
+            [int(self.value_counts[value_index]), self.max_value_count]
+        )
 
         # update predicted issue weight
         # the intuition here is that if the values of the receiverd offers spread out over all
@@ -92,30 +143,32 @@ class IssueEstimator:
             self.bids_received - equal_shares
         )
 
-        # recalculate all value utilities
-        for value_tracker in self.value_trackers.values():
-            value_tracker.recalculate_utility(self.max_value_count, self.weight)
-
-    def get_value_utility(self, value: Value):
-        if value in self.value_trackers:
-            return self.value_trackers[value].utility
+        self._value_utilities = None
 
-        return 0
+    def get_value_utilities(self) -> np.ndarray:
+        """Predicted utility of every value (in the order of the DiscreteValueSet),
+        values that were never offered have utility 0."""
+        if self._value_utilities is None:
+            self._value_utilities = np.zeros(len(self.value_counts))
+            for value_index in np.flatnonzero(self.value_counts):
+                self._value_utilities[value_index] = self._calculate_utility(
+                    int(self.value_counts[value_index])
+                )
 
+        return self._value_utilities
 
-class ValueEstimator:
-    def __init__(self):
-        self.count = 0
-        self.utility = 0
+    def get_value_utility(self, value: Value):
+        value_index = self.value_indices.get(value)
+        if value_index is not None and self.value_counts[value_index] > 0:
+            return float(self.get_value_utilities()[value_index])
 
-    def update(self):
-        self.count += 1
+        return 0
 
-    def recalculate_utility(self, max_value_count: int, weight: float):
-        if weight < 1:
-            mod_value_count = ((self.count + 1) ** (1 - weight)) - 1
-            mod_max_value_count = ((max_value_count + 1) ** (1 - weight)) - 1
+    def _calculate_utility(self, value_count: int) -> float:
+        if self.weight < 1:
+            mod_value_count = ((value_count + 1) ** (1 - self.weight)) - 1
+            mod_max_value_count = ((self.max_value_count + 1) ** (1 - self.weight)) - 1
 
-            self.utility = mod_value_count / mod_max_value_count
+            return mod_value_count / mod_max_value_count
         else:
-            self.utility = 1
+            return 1
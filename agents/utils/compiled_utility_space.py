@@ -0,0 +1,126 @@
+from typing import List
+
+import numpy as np
+from geniusweb.issuevalue.Bid import Bid
+from geniusweb.issuevalue.DiscreteValueSet import DiscreteValueSet
+from geniusweb.profile.utilityspace.LinearAdditiveUtilitySpace import (
+    LinearAdditiveUtilitySpace,
+)
+
+
+class CompiledUtilitySpace:
+    """Float version of a LinearAdditiveUtilitySpace. The profile is compiled once into
+    a table of issue weight times value utility per issue, so that a utility is a sum
+    of a few float lookups instead of Decimal arithmetic. The utilities agree with
+    `LinearAdditiveUtilitySpace.getUtility` up to float precision (< 1e-9).
+
+    Bids can be evaluated directly (`utility`) or encoded as rows of value indices and
+    evaluated in batches with NumPy (`encode_many` and `utilities`). The issues are in
+    sorted order, the canonical issue order that the precomputed domain artifacts
+    (`utils.domain_artifacts`) use as well.
+
+    Args:
+        profile (LinearAdditiveUtilitySpace): profile to compile
+    """
+
+    def __init__(self, profile: LinearAdditiveUtilitySpace):
+        self.profile = profile
+        domain = profile.getDomain()
+        self.issues = sorted(domain.getIssues())
+
+        value_sets = [domain.getValues(issue) for issue in self.issues]
+        if not all(isinstance(v, DiscreteValueSet) for v in value_sets):
+            raise TypeError("Only issues with discrete values can be compiled")
+        self.values = [list(value_set.getValues()) for value_set in value_sets]
+        self.value_indices = [
+            {value: j for j, value in enumerate(issue_values)} for issue_values in self.values
+        ]
+
+        # weighted utility of every value, per issue
+        self.utility_tables = []
+        for issue, issue_values in zip(self.issues, self.values):
+            weight = profile.getWeight(issue)
+            value_utilities = profile.getUtilities()[issue]
+            self.utility_tables.append(
+                [float(weight * value_utilities.getUtility(value)) for value in issue_values]
+            )
+        # the same tables as one array, padded with zeros, for batched evaluation
+        max_values = max(len(issue_values) for issue_values in self.values)
+        self.table = np.zeros((len(self.issues), max_values))
+        for i, utility_table in enumerate(self.utility_tables):
+            self.table[i, : len(utility_table)] = utility_table
+
+    def utility(self, bid: Bid) -> float:
+        """Utility of a bid, values that are missing from the bid count as 0.
+
+        Args:
+            bid (Bid): bid to evaluate
+
+        Returns:
+            float: utility
+        """
+        utility = 0.0
+        for issue, value_indices, utility_table in zip(
+            self.issues, self.value_indices, self.utility_tables
+        ):
+            value = bid.getValue(issue)
+            if value is not None:
+                utility += utility_table[value_indices[value]]
+
+        return utility
+
+    def encode(self, bid: Bid) -> List[int]:
+        """Encode a complete bid as value indices.
+
+        Args:
+            bid (Bid): bid with a value for every issue
+
+        Returns:
+            list[int]: index of the value of every issue (in the order of `issues`)
+        """
+        return [
+            value_indices[bid.getValue(issue)]
+            for issue, value_indices in zip(self.issues, self.value_indices)
+        ]
+
+    def encode_many(self, bids: List[Bid]) -> np.ndarray:
+        """Encode complete bids as a matrix of value indices.
+
+        Args:
+            bids (list[Bid]): bids with a value for every issue
+
+        Returns:
+            np.ndarray: integer matrix of shape (number of bids, number of issues)
+        """
+        bid_matrix = np.empty((len(bids), len(self.issues)), dtype=np.int32)
+        for i, (issue, value_indices) in enumerate(zip(self.issues, self.value_indices)):
+            bid_matrix[:, i] = [value_indices[bid.getValue(issue)] for bid in bids]
+
+        return bid_matrix
+
+    def decode(self, value_indices: List[int]) -> Bid:
+        """Convert value indices back to a bid, see `encode`.
+
+        Args:
+            value_indices (list[int]): index of the value of every issue
+
+        Returns:
+            Bid: bid
+        """
+        return Bid(
+            {
+                issue: issue_values[j]
+                for issue, issue_values, j in zip(self.issues, self.values, value_indices)
+            }
+        )
+
+    def utilities(self, bid_matrix: np.ndarray) -> np.ndarray:
+        """Utilities of encoded bids.
+
+        Args:
+            bid_matrix (np.ndarray): integer matrix of value indices, see `encode_many`
+
+        Returns:
+            np.ndarray: utility of every bid
+        """
+        return self.table[np.arange(len(self.issues)), bid_matrix].sum(axis=1)
@@ -0,0 +1,114 @@
+import heapq
+from decimal import Decimal
+from typing import Iterator, Tuple
+
+from geniusweb.issuevalue.Bid import Bid
+from geniusweb.issuevalue.DiscreteValueSet import DiscreteValueSet
+from geniusweb.profile.utilityspace.LinearAdditiveUtilitySpace import (
+    LinearAdditiveUtilitySpace,
+)
+
+
+def iter_bids_descending(
+    profile: LinearAdditiveUtilitySpace,
+) -> Iterator[Tuple[Bid, Decimal]]:
+    """Enumerate all bids in descending order of utility, without enumerating or sorting
+    the complete domain. The values of every issue are sorted on their weighted
+    utility, a bid is then a position in every sorted issue and its utility is the
+    maximum utility minus the loss of every issue. Bids are taken from a heap on this
+    loss, which only holds the successors of the bids that were already emitted.
+
+    Args:
+        profile (LinearAdditiveUtilitySpace): profile to enumerate the bids of
+
+    Yields:
+        tuple[Bid, Decimal]: bid and its utility
+    """
+    domain = profile.getDomain()
+    issues = sorted(domain.getIssues())
+
+    sorted_values, losses = [], []
+    max_utility = Decimal(0)
+    for issue in issues:
+        value_set = domain.getValues(issue)
+        if not isinstance(value_set, DiscreteValueSet):
+            raise TypeError("Only issues with discrete values can be enumerated")
+        weight = profile.getWeight(issue)
+        value_utilities = profile.getUtilities()[issue]
+        utilities = sorted(
+            ((weight * value_utilities.getUtility(v), v) for v in value_set.getValues()),
+            key=lambda x: x[0],
+            reverse=True,
+        )
+        sorted_values.append([v for _, v in utilities])
+        # loss of utility compared to the best value of the issue
+        losses.append([utilities[0][0] - u for u, _ in utilities])
+        max_utility += utilities[0][0]
+
+    # heap of (loss, positions in the sorted issues, last issue that was moved). Every
+    # bid is pushed once: only by moving an issue at or after the last moved issue.
+    heap = [(Decimal(0), (0,) * len(issues), 0)]
+    while heap:
+        loss, positions, last = heapq.heappop(heap)
+        bid = Bid(
+            {issue: values[p] for issue, values, p in zip(issues, sorted_values, positions)}
+        )
+        yield bid, max_utility - loss
+
+        for i in range(last, len(issues)):
+            p = positions[i]
+            if p + 1 < len(losses[i]):
+                successor = positions[:i] + (p + 1,) + positions[i + 1 :]
+                successor_loss = loss - losses[i][p] + losses[i][p + 1]
+                heapq.heappush(heap, (successor_loss, successor, i))
+
+
+class DescendingBids:
+    """All bids of a profile in descending order of utility, as a sequence that is only
+    enumerated as far as it is indexed (see `iter_bids_descending`). Negative indices
+    are not supported, as they would require the enumeration of the complete domain.
+
+    Args:
+        profile (LinearAdditiveUtilitySpace): profile to enumerate the bids of
+    """
+
+    def __init__(self, profile: LinearAdditiveUtilitySpace):
+        self._bids_iter = iter_bids_descending(profile)
+        self._bids = []
+        self._utilities = []
+
+        domain = profile.getDomain()
+        self._size = 1
+        for issue in domain.getIssues():
+            self._size *= domain.getValues(issue).size()
+
+    def __getitem__(self, index: int) -> Bid:
+        self._enumerate(index)
+        return self._bids[index]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Bid]:
+        for index in range(self._size):
+            yield self[index]
+
+    def utility(self, index: int) -> Decimal:
+        """Utility of the bid at an index.
+
+        Args:
+            index (int): position of the bid
+
+        Returns:
+            Decimal: utility
+        """
+        self._enumerate(index)
+        return self._utilities[index]
+
+    def _enumerate(self, index: int):
+        if not 0 <= index < self._size:
+            raise IndexError(f"bid index {index} out of range [0, {self._size})")
+        while len(self._bids) <= index:
+            bid, utility = next(self._bids_iter)
+            self._bids.append(bid)
+            self._utilities.append(utility)
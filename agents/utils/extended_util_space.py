@@ -0,0 +1,109 @@
+from decimal import Decimal
+from typing import Iterator
+
+import numpy as np
+from geniusweb.issuevalue.Bid import Bid
+from geniusweb.profile.utilityspace.LinearAdditive import LinearAdditive
+
+from .compiled_utility_space import CompiledUtilitySpace
+
+
+class ExtendedUtilSpace:
+    """Drop-in replacement of the ExtendedUtilSpace of the time dependent agent that
+    does not use BidsWithUtility. The float utilities of all bids are computed once
+    and sorted, so that the bids in a utility interval are found with two binary
+    searches. The minimum, maximum and tolerance are computed per issue (exact, as
+    Decimal).
+
+    Args:
+        space (LinearAdditive): profile of the agent
+    """
+
+    def __init__(self, space: LinearAdditive):
+        self._utilspace = space
+        self._compiled = CompiledUtilitySpace(space)
+        self._shape = tuple(len(values) for values in self._compiled.values)
+
+        # utilities of all bids, numbered in the (C) order of the value indices
+        utilities = np.zeros(())
+        for utility_table in self._compiled.utility_tables:
+            utilities = np.add.outer(utilities, utility_table)
+        utilities = utilities.ravel()
+
+        self._order = np.argsort(utilities, kind="stable")
+        self._sorted_utilities = utilities[self._order]
+
+        self._computeMinMax()
+        self._tolerance = self._computeTolerance()
+
+    def _computeMinMax(self):
+        weighted_utils = self._getWeightedUtils()
+        self._minUtil = sum(min(utils) for utils in weighted_utils)
+        self._maxUtil = sum(max(utils) for utils in weighted_utils)
+
+        rvbid = self._utilspace.getReservationBid()
+        if rvbid is not None:
+            rv = self._utilspace.getUtility(rvbid)
+            if rv > self._minUtil:
+                self._minUtil = rv
+
+    def _computeTolerance(self) -> Decimal:
+        """The minimum difference between the weighted utility of the best and
+        one-but-best value of any issue."""
+        tolerance = Decimal(1)
+        for utils in self._getWeightedUtils():
+            if len(utils) > 1:
+                best, second = sorted(utils, reverse=True)[:2]
+                tolerance = min(tolerance, best - second)
+        return tolerance
+
+    def _getWeightedUtils(self):
+        return [
+            [
+                self._utilspace.getWeight(issue)
+                * self._utilspace.getUtilities()[issue].getUtility(value)
+                for value in values
+            ]
+            for issue, values in zip(self._compiled.issues, self._compiled.values)
+        ]
+
+    def getMin(self) -> Decimal:
+        return self._minUtil
+
+    def getMax(self) -> Decimal:
+        return self._maxUtil
+
+    def getBids(self, utilityGoal: Decimal) -> "SortedBids":
+        """
+        @param utilityGoal the requested utility
+        @return bids with utility inside [utilitygoal-{@link #tolerance},
+                utilitygoal]
+        """
+        start = np.searchsorted(
+            self._sorted_utilities, float(utilityGoal - self._tolerance), side="left"
+        )
+        stop = np.searchsorted(self._sorted_utilities, float(utilityGoal), side="right")
+        return SortedBids(self, self._order[start:stop])
+
+
+class SortedBids:
+    """Bids of an interval of the sorted bid space, they are only created when they are
+    accessed. Supports the `size` and `get` methods of an ImmutableList.
+    """
+
+    def __init__(self, space: ExtendedUtilSpace, bid_nrs: np.ndarray):
+        self._space = space
+        self._bid_nrs = bid_nrs
+
+    def size(self) -> int:
+        return len(self._bid_nrs)
+
+    def get(self, index: int) -> Bid:
+        value_indices = np.unravel_index(self._bid_nrs[index], self._space._shape)
+        return self._space._compiled.decode([int(j) for j in value_indices])
+
+    def __len__(self) -> int:
+        return self.size()
+
+    def __iter__(self) -> Iterator[Bid]:
+        return (self.get(i) for i in range(self.size()))
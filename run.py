@@ -15,6 +15,11 @@ if not RESULTS_DIR.exists():
 #   You need to specify the classpath of 2 agents to start a negotiation. Parameters for the agent can be added as a dict (see example)
 #   You need to specify the preference profiles for both agents. The first profile will be assigned to the first agent.
 #   You need to specify a time deadline (is milliseconds (ms)) we are allowed to negotiate before we end without agreement
+#   Optionally, the session can be run by a lightweight in-process engine ("engine": "direct") instead of the geniusweb Runner.
+#   The session can also run on a virtual clock ("time_mode": "virtual") that only advances by the compute time
+#   of the agents plus a fixed cost per turn ("turn_cost_ms"). Sessions then finish at CPU speed instead of wall-clock time.
+#   Utilities in the trace are computed with a fast float evaluator, set "verify_utilities" to True to check them
+#   against the exact Decimal utilities of geniusweb (slower).
 settings = {
     "agents": [
         {
@@ -30,15 +35,20 @@ settings = {
     "deadline_time_ms": 10000,
 }
 
+# for very long sessions, the trace can be streamed to a JSONL file instead of being held in memory
+stream_trace = False
+trace_file = RESULTS_DIR.joinpath("session_results_trace.jsonl") if stream_trace else None
+
 # run a session and obtain results in dictionaries
-session_results_trace, session_results_summary = run_session(settings)
+session_results_trace, session_results_summary = run_session(settings, trace_file=trace_file)
 
 # plot trace to html file
 if not session_results_trace["error"]:
     plot_trace(session_results_trace, RESULTS_DIR.joinpath("trace_plot.html"))
 
-# write results to file
-with open(RESULTS_DIR.joinpath("session_results_trace.json"), "w", encoding="utf-8") as f:
-    f.write(json.dumps(session_results_trace, indent=2))
+# write results to file (a streamed trace is already on disk)
+if not stream_trace:
+    with open(RESULTS_DIR.joinpath("session_results_trace.json"), "w", encoding="utf-8") as f:
+        f.write(json.dumps(session_results_trace, indent=2))
 with open(RESULTS_DIR.joinpath("session_results_summary.json"), "w", encoding="utf-8") as f:
     f.write(json.dumps(session_results_summary, indent=2))
@@ -5,16 +5,22 @@ import time
 
 from utils.runners import run_tournament
 
-RESULTS_DIR = Path("results", time.strftime('%Y%m%d-%H%M%S'))
-
-# create results directory if it does not exist
-if not RESULTS_DIR.exists():
-    RESULTS_DIR.mkdir(parents=True)
-
 # Settings to run a negotiation session:
 #   You need to specify the classpath of 2 agents to start a negotiation. Parameters for the agent can be added as a dict (see example)
 #   You need to specify the preference profiles for both agents. The first profile will be assigned to the first agent.
 #   You need to specify a time deadline (is milliseconds (ms)) we are allowed to negotiate before we end without agreement.
+#   Optionally, sessions can be run in parallel over a pool of processes ("parallel"). The number of processes defaults
+#   to the number of CPU cores and can be set through "num_workers". Every process gets its own "storage_dir" subdirectory.
+#   Optionally, every finished session is appended to a journal file ("journal"). Restarting the tournament with the
+#   same journal skips the sessions that already finished, so an interrupted tournament can be resumed.
+#   Optionally, session summaries are cached in a directory ("cache_dir"), keyed on a hash of the agent source code, the
+#   profiles and the deadline. Rerunning a tournament then only runs the sessions of which one of these inputs changed.
+#   Optionally, the trace of every session is archived in a compact format in a directory ("trace_dir"), with one file
+#   per profile set that holds all its sessions. These files can be read back with `utils.trace_columns.load_traces`.
+#   Optionally, session summaries are appended to a columnar store in a directory ("result_store"). Load it with
+#   `utils.result_store.load_results(directory)` and pass it to `process_tournament_results` to aggregate it.
+#   The "profile_sets" can also be selected on the properties of the domains with `utils.domain_index.select_profile_sets`,
+#   e.g. `select_profile_sets(lambda d: d["size"] > 5000 and d["opposition"] > 0.5)`.
 tournament_settings = {
     "agents": [
         {
@@ -120,16 +126,25 @@ tournament_settings = {
         ["domains/domain01/profileA.json", "domains/domain01/profileB.json"],
     ],
     "deadline_time_ms": 10000,
+    "parallel": False,
 }
 
-# run a session and obtain results in dictionaries
-tournament_steps, tournament_results, tournament_results_summary = run_tournament(tournament_settings)
+# the guard is required for the parallel mode on platforms that spawn new processes
+if __name__ == "__main__":
+    RESULTS_DIR = Path("results", time.strftime('%Y%m%d-%H%M%S'))
+
+    # create results directory if it does not exist
+    if not RESULTS_DIR.exists():
+        RESULTS_DIR.mkdir(parents=True)
+
+    # run a session and obtain results in dictionaries
+    tournament_steps, tournament_results, tournament_results_summary = run_tournament(tournament_settings)
 
-# save the tournament settings for reference
-with open(RESULTS_DIR.joinpath("tournament_steps.json"), "w", encoding="utf-8") as f:
-    f.write(json.dumps(tournament_steps, indent=2))
-# save the tournament results
-with open(RESULTS_DIR.joinpath("tournament_results.json"), "w", encoding="utf-8") as f:
-    f.write(json.dumps(tournament_results, indent=2))
-# save the tournament results summary
-tournament_results_summary.to_csv(RESULTS_DIR.joinpath("tournament_results_summary.csv"))
+    # save the tournament settings for reference
+    with open(RESULTS_DIR.joinpath("tournament_steps.json"), "w", encoding="utf-8") as f:
+        f.write(json.dumps(tournament_steps, indent=2))
+    # save the tournament results
+    with open(RESULTS_DIR.joinpath("tournament_results.json"), "w", encoding="utf-8") as f:
+        f.write(json.dumps(tournament_results, indent=2))
+    # save the tournament results summary
+    tournament_results_summary.to_csv(RESULTS_DIR.joinpath("tournament_results_summary.csv"))
@@ -0,0 +1,172 @@
+from math import sqrt
+
+import numpy as np
+
+from utils.create_domains import Domain
+
+# slack on the bounds, so that rounding never prunes a branch with an (equally) good bid
+EPSILON = 1e-9
+
+
+def get_specials(domain: Domain) -> dict:
+    """Find the social welfare, Nash and Kalai-Smorodinsky bids of a domain with two
+    linear additive profiles, without enumerating the domain or its Pareto front. The
+    bids are found with a branch-and-bound search over the issues, using per-issue
+    bounds on the utilities. The result is the same as the entries in specials.json
+    as calculated by `Domain.calculate_specials`.
+
+    Args:
+        domain (Domain): domain with profile A and B
+
+    Returns:
+        dict: "social_welfare", "nash" and "kalai" bids (bid and utilities) and the
+            "opposition" of the domain
+    """
+    solver = _Solver(domain)
+    kalai = solver.kalai()
+    utility_A, utility_B = kalai["utility"]
+
+    return {
+        "opposition": sqrt((utility_A - 1.0) ** 2 + (utility_B - 1.0) ** 2),
+        "social_welfare": solver.social_welfare(),
+        "nash": solver.nash(),
+        "kalai": kalai,
+    }
+
+
+def get_social_welfare_bid(domain: Domain) -> dict:
+    return _Solver(domain).social_welfare()
+
+
+def get_nash_bid(domain: Domain) -> dict:
+    return _Solver(domain).nash()
+
+
+def get_kalai_bid(domain: Domain) -> dict:
+    return _Solver(domain).kalai()
+
+
+class _Solver:
+    def __init__(self, domain: Domain):
+        self.domain = domain
+        issues_values = domain.domain["issuesValues"]
+        self.tables_A = domain.profile_A.get_utility_tables(issues_values)
+        self.tables_B = domain.profile_B.get_utility_tables(issues_values)
+
+        # maximum and minimum utilities that the remaining issues (from issue i) can add
+        self.max_A = _suffix_sums([t.max() for t in self.tables_A])
+        self.max_B = _suffix_sums([t.max() for t in self.tables_B])
+        self.min_A = _suffix_sums([t.min() for t in self.tables_A])
+        self.max_sum = _suffix_sums(
+            [(a + b).max() for a, b in zip(self.tables_A, self.tables_B)]
+        )
+
+        # try the values with the highest joint utility first
+        self.value_order = [
+            np.argsort(-(a + b), kind="stable").tolist()
+            for a, b in zip(self.tables_A, self.tables_B)
+        ]
+        self.tables_A = [t.tolist() for t in self.tables_A]
+        self.tables_B = [t.tolist() for t in self.tables_B]
+
+    def social_welfare(self) -> dict:
+        # highest sum of utilities, the first of these bids on the Pareto front
+        return self._search(
+            key=lambda a, b: (a + b, -a),
+            bound=lambda a, b, i: a + b + self.max_sum[i],
+        )
+
+    def nash(self) -> dict:
+        # highest product of utilities, the first of these bids on the Pareto front
+        return self._search(
+            key=lambda a, b: (a * b, -a),
+            bound=lambda a, b, i: (a + self.max_A[i]) * (b + self.max_B[i]),
+        )
+
+    def kalai(self) -> dict:
+        """The Pareto front (sorted by utility A) is split in the bids with A <= B and
+        the bids with A > B at the highest minimum utility of any bid. The Kalai-
+        Smorodinsky bid is the last bid before or the first bid after this split."""
+        max_min = self._search(
+            key=lambda a, b: (min(a, b),),
+            bound=lambda a, b, i: min(a + self.max_A[i], b + self.max_B[i]),
+        )
+        m = min(max_min["utility"])
+
+        # first bid on the Pareto front with A > m
+        first_after = self._search(
+            key=lambda a, b: (b, a) if a > m else None,
+            bound=lambda a, b, i: b + self.max_B[i],
+            prune=lambda a, b, i: a + self.max_A[i] < m - EPSILON,
+        )
+        # last bid on the Pareto front with A <= m, it has B >= m. If the first bid
+        # after the split has B == m, it dominates the bids before it with B == m.
+        min_B = m
+        if first_after is not None and first_after["utility"][1] >= m:
+            min_B = np.nextafter(m, np.inf)
+        last_before = self._search(
+            key=lambda a, b: (a, b) if a <= m and b >= min_B else None,
+            bound=lambda a, b, i: a + self.max_A[i],
+            prune=lambda a, b, i: a + self.min_A[i] > m + EPSILON
+            or b + self.max_B[i] < min_B - EPSILON,
+        )
+
+        candidates = [c for c in (last_before, first_after) if c is not None]
+        return min(candidates, key=lambda c: abs(c["utility"][0] - c["utility"][1]))
+
+    def _search(self, key, bound, prune=None) -> dict:
+        """Depth-first branch-and-bound search for the bid with the highest key.
+
+        Args:
+            key (callable): key of a complete bid from its utilities (a, b), higher is
+                better, None if the bid is not feasible. The first element is the
+                objective that is bounded. Ties are broken on the lowest bid number.
+            bound (callable): upper bound on the objective of any bid that completes
+                a partial bid with utilities (a, b) up to issue i
+            prune (callable, optional): True if no bid that completes a partial bid
+                with utilities (a, b) up to issue i is feasible. Defaults to None.
+
+        Returns:
+            dict: bid and utilities, None if no bid is feasible
+        """
+        num_issues = len(self.tables_A)
+        best = {"key": None, "values": None, "utility": None}
+        values = [0] * num_issues
+
+        def visit(i, a, b):
+            if i == num_issues:
+                bid_key = key(a, b)
+                if bid_key is None:
+                    return
+                if (
+                    best["key"] is None
+                    or bid_key > best["key"]
+                    or (bid_key == best["key"] and values < best["values"])
+                ):
+                    best.update(key=bid_key, values=list(values), utility=[a, b])
+                return
+
+            if prune is not None and prune(a, b, i):
+                return
+            if best["key"] is not None and bound(a, b, i) < best["key"][0] - EPSILON:
+                return
+
+            table_A, table_B = self.tables_A[i], self.tables_B[i]
+            for j in self.value_order[i]:
+                values[i] = j
+                visit(i + 1, a + table_A[j], b + table_B[j])
+
+        visit(0, 0.0, 0.0)
+
+        if best["key"] is None:
+            return None
+        bid_nr = np.ravel_multi_index(best["values"], self.domain.get_shape())
+        return {"bid": self.domain.get_bid(bid_nr), "utility": best["utility"]}
+
+
+def _suffix_sums(values: list) -> list:
+    # sums of values[i:] for every i, including 0 for the empty suffix
+    sums = [0.0]
+    for value in reversed(values):
+        sums.append(sums[-1] + float(value))
+    return sums[::-1]
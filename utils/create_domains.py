@@ -1,26 +1,150 @@
+import argparse
 import json
 import math
 import os
+import sys
+from functools import partial
 from itertools import product
 from math import sqrt
-from random import randint
+from multiprocessing import Pool
+from pathlib import Path
 from shutil import rmtree
 from string import ascii_uppercase
 from typing import Iterable
 
 import numpy as np
 import plotly.graph_objects as go
-from numpy.random import dirichlet
+import plotly.io as pio
+from scipy.spatial import cKDTree
 
 NUM_DOMAINS_TO_GENERATE = 50
 
-
-def main():
-    for i in range(NUM_DOMAINS_TO_GENERATE):
-        domain = Domain.create_random(f"domain{i:03d}")
-        domain.calculate_specials()
-        domain.generate_visualisation()
-        domain.to_file("domains/")
+# above these numbers of bids, the bids are plotted with WebGL or as a density
+WEBGL_THRESHOLD = 10000
+DENSITY_THRESHOLD = 1000000
+
+
+def main(argv=None):
+    # run from the root of the repository: python -m utils.create_domains [options]
+    parser = argparse.ArgumentParser(description="Generate random negotiation domains.")
+    parser.add_argument("--count", type=int, default=NUM_DOMAINS_TO_GENERATE)
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="domain i is generated from (seed, i), defaults to a random seed",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="domains/")
+    parser.add_argument("--min-size", type=int, default=200)
+    parser.add_argument("--max-size", type=int, default=10000)
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="number of bids to process at once, for domains that do not fit in memory",
+    )
+    parser.add_argument(
+        "--images",
+        choices=("now", "defer", "skip"),
+        default="now",
+        help="export the visualisations now, save them to export later or skip them",
+    )
+    parser.add_argument(
+        "--export-deferred",
+        action="store_true",
+        help="only export the deferred visualisations in --out",
+    )
+    args = parser.parse_args(argv)
+
+    if args.export_deferred:
+        export_deferred_images(args.out, args.workers)
+        return
+
+    seed = np.random.SeedSequence().entropy if args.seed is None else args.seed
+    print(f"generating {args.count} domains with seed {seed}")
+
+    generate = partial(
+        generate_domain,
+        seed=seed,
+        parent_path=args.out,
+        size_range=(args.min_size, args.max_size),
+        chunk_size=args.chunk_size,
+        images=args.images,
+    )
+    if args.workers > 1:
+        with Pool(args.workers) as pool:
+            for _ in pool.imap_unordered(generate, range(args.count)):
+                pass
+    else:
+        for i in range(args.count):
+            generate(i)
+
+    # imported here, so that this module does not depend on the others on import
+    from utils.domain_index import build_index
+
+    build_index(args.out)
+
+
+def export_deferred_images(parent_path: str, workers: int = 1):
+    """Export the visualisations that were deferred by `Domain.to_file` to PDF. The
+    images are exported in a process pool, as this is the slowest step of generating
+    domains.
+
+    Args:
+        parent_path (str): directory that holds the domain directories
+        workers (int, optional): number of processes. Defaults to 1.
+    """
+    figure_files = sorted(Path(parent_path).glob("*/visualisation.json"))
+    if workers > 1:
+        with Pool(workers) as pool:
+            for _ in pool.imap_unordered(_export_image, figure_files):
+                pass
+    else:
+        for figure_file in figure_files:
+            _export_image(figure_file)
+
+
+def _export_image(figure_file: Path):
+    fig = pio.read_json(figure_file)
+    fig.write_image(file=figure_file.with_suffix(".pdf"), scale=5)
+    figure_file.unlink()
+
+
+def generate_domain(
+    index: int,
+    seed: int,
+    parent_path: str,
+    size_range: tuple = (200, 10000),
+    chunk_size: int = None,
+    images: str = "now",
+):
+    """Generate a random domain, calculate its specials and write it to file. The
+    random generator is derived from the seed and the index of the domain only, so
+    the generated domain does not depend on the order or process it is generated in.
+
+    Args:
+        index (int): index of the domain, also used in its name
+        seed (int): seed of the complete set of domains
+        parent_path (str): directory to write the domain to
+        size_range (tuple, optional): minimum and maximum number of bids. Defaults to
+            (200, 10000).
+        chunk_size (int, optional): see `Domain.calculate_specials`. Binary artifacts
+            (see `utils.domain_artifacts`) are only saved if this is None. Defaults to None.
+        images (str, optional): see `Domain.to_file`, "skip" does not generate the
+            visualisation at all. Defaults to "now".
+    """
+    rng = np.random.default_rng([seed, index])
+    domain = Domain.create_random(f"domain{index:03d}", rng, *size_range)
+    domain.calculate_specials(chunk_size)
+    if images != "skip":
+        domain.generate_visualisation(chunk_size=chunk_size)
+    domain.to_file(parent_path, images)
+    if chunk_size is None:
+        # imported here, the artifacts module depends on this module
+        from utils.domain_artifacts import save_artifacts
+
+        save_artifacts(domain, parent_path)
 
 
 class Profile:
@@ -49,9 +173,12 @@ class Profile:
         return cls(profile, issue_weights, value_weights)
 
     @classmethod
-    def create_random(cls, domain, name):
+    def create_random(cls, domain, name, rng: np.random.Generator = None):
+        if rng is None:
+            rng = np.random.default_rng()
+
         def dirichlet_dist(names, mode, alpha=1):
-            distribution = (dirichlet([alpha] * len(names)) * 100000).astype(int)
+            distribution = (rng.dirichlet([alpha] * len(names)) * 100000).astype(int)
             if mode == "issues":
                 distribution[0] += 100000 - np.sum(distribution)
             if mode == "values":
@@ -103,6 +230,23 @@ class Profile:
             self.issue_weights[i] * self.value_weights[i][v] for i, v in bid.items()
         )
 
+    def get_utility_tables(self, issues_values: dict) -> list:
+        """Weighted utilities of the values of every issue as NumPy arrays.
+
+        Args:
+            issues_values (dict): issues and their values, as in the domain
+
+        Returns:
+            list[np.ndarray]: per issue, the issue weight times the value weight of
+                every value, in the order of the values in the domain
+        """
+        return [
+            np.array(
+                [self.issue_weights[i] * self.value_weights[i][v] for v in v_dict["values"]]
+            )
+            for i, v_dict in issues_values.items()
+        ]
+
 
 class Domain:
     def __init__(
@@ -129,13 +273,25 @@ class Domain:
         self.opposition = opposition
         self.visualisation = visualisation
 
+        # utilities of all bids, computed on first use
+        self._utilities = None
+
     @classmethod
-    def create_random(cls, name):
-        domain_size = randint(200, 10000)
+    def create_random(
+        cls,
+        name,
+        rng: np.random.Generator = None,
+        min_size: int = 200,
+        max_size: int = 10000,
+    ):
+        if rng is None:
+            rng = np.random.default_rng()
+
+        domain_size = rng.integers(min_size, max_size, endpoint=True)
 
         while True:
-            num_issues = randint(4, 10)
-            spread = dirichlet([1] * num_issues)
+            num_issues = rng.integers(4, 10, endpoint=True)
+            spread = rng.dirichlet([1] * num_issues)
             multiplier = (domain_size / np.prod(spread)) ** (1.0 / num_issues)
             values_per_issue = np.round(multiplier * spread).astype(np.int32)
             values_per_issue = np.clip(values_per_issue, 2, None)
@@ -145,12 +301,12 @@ class Domain:
 
         issuesValues = {}
         for issue, num_values in zip(issues, values_per_issue):
-            values = {"values": [f"value{x}" for x in ascii_uppercase[:num_values]]}
+            values = {"values": [f"value{x}" for x in _value_names(num_values)]}
             issuesValues[f"issue{issue}"] = values
 
         domain = {"name": name, "issuesValues": issuesValues}
-        profile_A = Profile.create_random(domain, "profileA")
-        profile_B = Profile.create_random(domain, "profileB")
+        profile_A = Profile.create_random(domain, "profileA", rng)
+        profile_B = Profile.create_random(domain, "profileB", rng)
         return cls(domain, profile_A, profile_B)
 
     @classmethod
@@ -168,22 +324,33 @@ class Domain:
                 domain,
                 profile_A,
                 profile_B,
-                SW_bid=specials["social_welfare"],
+                SW_bid=specials.get("social_welfare"),
                 nash_bid=specials["nash"],
                 kalai_bid=specials["kalai"],
                 pareto_front=specials["pareto_front"],
-                distribution=specials["distribution"],
+                distribution=specials.get("distribution"),
                 opposition=specials["opposition"],
             )
         else:
             domain = cls(domain, profile_A, profile_B)
             return domain
 
-    def calculate_specials(self):
+    def calculate_specials(self, chunk_size: int = None):
+        """Calculate the Pareto front, distribution, opposition and the social welfare,
+        Nash and Kalai-Smorodinsky bids.
+
+        Args:
+            chunk_size (int, optional): number of bids to process at once. By default the
+                utilities of all bids are held in memory, for very large domains the bids
+                can be streamed in chunks instead. Defaults to None.
+
+        Returns:
+            bool: False if the specials were already calculated
+        """
         if self.nash_bid:
             return False
-        self.pareto_front = self.get_pareto(list(self.iter_bids()))
-        self.distribution = self.get_distribution(self.iter_bids())
+        self.pareto_front = self.get_pareto(chunk_size)
+        self.distribution = self.get_distribution(chunk_size)
 
         SW_utility = 0
         nash_utility = 0
@@ -209,21 +376,61 @@ class Domain:
 
         return True
 
-    def generate_visualisation(self):
-        bid_utils = [self.get_utilities(bid) for bid in self.iter_bids()]
-        bid_utils = list(zip(*bid_utils))
+    def generate_visualisation(self, mode: str = "auto", chunk_size: int = None):
+        """Plot the utilities of all bids, the Pareto front and the Nash and Kalai-
+        Smorodinsky bids.
+
+        Args:
+            mode (str, optional): "scatter" plots a marker per bid, "webgl" does the same
+                with WebGL and "density" plots the number of bids per utility bin. "auto"
+                selects the mode on the size of the domain. Defaults to "auto".
+            chunk_size (int, optional): number of bids to process at once in the
+                density mode, see `calculate_specials`. Defaults to None.
+        """
+        if mode == "auto":
+            if self.get_size() <= WEBGL_THRESHOLD:
+                mode = "scatter"
+            elif self.get_size() <= DENSITY_THRESHOLD:
+                mode = "webgl"
+            else:
+                mode = "density"
 
         fig = go.Figure()
 
-        fig.add_trace(
-            go.Scatter(
-                x=bid_utils[0],
-                y=bid_utils[1],
-                mode="markers",
-                name="bids",
-                marker=dict(size=3),
+        if mode == "density":
+            bins = np.linspace(0.0, 1.0, 201)
+            if chunk_size is None:
+                chunks = [(0, self.get_utility_matrix())]
+            else:
+                chunks = self.iter_utility_chunks(chunk_size)
+            counts = np.zeros((len(bins) - 1, len(bins) - 1))
+            for _, utilities in chunks:
+                counts += np.histogram2d(
+                    utilities[:, 0], utilities[:, 1], bins=[bins, bins]
+                )[0]
+            centers = (bins[:-1] + bins[1:]) / 2
+            fig.add_trace(
+                go.Heatmap(
+                    x=centers,
+                    y=centers,
+                    z=np.log1p(counts.T),
+                    name="bids",
+                    colorscale="Greys",
+                    showscale=False,
+                )
+            )
+        else:
+            bid_utils = self.get_utility_matrix().T
+            scatter = go.Scatter if mode == "scatter" else go.Scattergl
+            fig.add_trace(
+                scatter(
+                    x=bid_utils[0],
+                    y=bid_utils[1],
+                    mode="markers",
+                    name="bids",
+                    marker=dict(size=3),
+                )
             )
-        )
 
         if self.pareto_front:
             pareto_utils = [bid["utility"] for bid in self.pareto_front]
@@ -268,7 +475,7 @@ class Domain:
 
         fig.update_layout(
             title=dict(
-                text=f"{self.get_name()}<br><sub>(size: {len(list(self.iter_bids()))}, opposition: {self.opposition:.4f}, distribution: {self.distribution:.4f})</sub>",
+                text=f"{self.get_name()}<br><sub>(size: {self.get_size()}, opposition: {self.opposition:.4f}, distribution: {self.distribution:.4f})</sub>",
                 x=0.5,
                 xanchor="center",
             )
@@ -276,7 +483,15 @@ class Domain:
 
         self.visualisation = fig
 
-    def to_file(self, parent_path):
+    def to_file(self, parent_path, images: str = "now"):
+        """Write the domain, profiles, specials and visualisation to a directory.
+
+        Args:
+            parent_path (str): directory that holds the domain directories
+            images (str, optional): "now" exports the visualisation to PDF, "defer" only
+                saves the figure, to be exported later with `export_deferred_images`,
+                and "skip" does not save it. Defaults to "now".
+        """
         path = os.path.join(parent_path, self.domain["name"])
         if os.path.exists(path):
             rmtree(path)
@@ -292,7 +507,7 @@ class Domain:
                 f.write(
                     json.dumps(
                         {
-                            "size": len(list(self.iter_bids())),
+                            "size": self.get_size(),
                             "opposition": self.opposition,
                             "distribution": self.distribution,
                             "social_welfare": self.SW_bid,
@@ -304,10 +519,12 @@ class Domain:
                     )
                 )
 
-        if self.visualisation:
+        if self.visualisation and images == "now":
             self.visualisation.write_image(
                 file=os.path.join(path, "visualisation.pdf"), scale=5
             )
+        elif self.visualisation and images == "defer":
+            self.visualisation.write_json(os.path.join(path, "visualisation.json"))
 
     def iter_bids(self) -> Iterable:
         return iter(self)
@@ -315,65 +532,119 @@ class Domain:
     def get_utilities(self, bid):
         return self.profile_A.get_utility(bid), self.profile_B.get_utility(bid)
 
-    def get_pareto(self, all_bids: list):
-        pareto_front = []
-        # dominated_bids = set()
-        while True:
-            candidate_bid = all_bids.pop(0)
-            bid_nr = 0
-            dominated = False
-            while len(all_bids) != 0 and bid_nr < len(all_bids):
-                bid = all_bids[bid_nr]
-                if self._dominates(candidate_bid, bid):
-                    # If it is dominated remove the bid from all bids
-                    all_bids.pop(bid_nr)
-                    # dominated_bids.add(frozenset(bid.items()))
-                elif self._dominates(bid, candidate_bid):
-                    dominated = True
-                    # dominated_bids.add(frozenset(candidate_bid.items()))
-                    bid_nr += 1
-                else:
-                    bid_nr += 1
-
-            if not dominated:
-                # add the non-dominated bid to the Pareto frontier
-                pareto_front.append(
-                    {
-                        "bid": candidate_bid,
-                        "utility": [
-                            self.profile_A.get_utility(candidate_bid),
-                            self.profile_B.get_utility(candidate_bid),
-                        ],
-                    }
-                )
+    def get_shape(self) -> tuple:
+        """Number of values of every issue, bids are numbered in the (C) order of this
+        shape, which is the order in which they are enumerated by `iter_bids`."""
+        return tuple(len(v["values"]) for v in self.domain["issuesValues"].values())
 
-            if len(all_bids) == 0:
-                break
+    def get_size(self) -> int:
+        return math.prod(self.get_shape())
 
-        pareto_front = sorted(pareto_front, key=lambda d: d["utility"][0])
+    def get_bid(self, bid_nr: int) -> dict:
+        """Materialise a bid from its number.
 
-        return pareto_front
+        Args:
+            bid_nr (int): number of the bid, see `get_shape`
 
-    def get_distribution(self, bids_iter) -> float:
-        min_distance_sum = 0.0
+        Returns:
+            dict[str, str]: bid dictionary where keys are issues and values are the values
+        """
+        value_indices = np.unravel_index(bid_nr, self.get_shape())
+        issues_values = self.domain["issuesValues"].items()
+        return {
+            issue: v_dict["values"][j]
+            for (issue, v_dict), j in zip(issues_values, value_indices)
+        }
 
-        for i, bid in enumerate(bids_iter):
-            min_distance = self.distance_to_pareto(bid)
-            min_distance_sum += min_distance
+    def get_utility_matrix(self) -> np.ndarray:
+        """Utilities of all bids for profile A and B, computed once from the utility
+        tables of the profiles. The issues are summed in the same order as in
+        `Profile.get_utility`, so both give exactly the same utilities.
+
+        Returns:
+            np.ndarray: utilities of shape (number of bids, 2), in the order of the bid
+                numbers
+        """
+        if self._utilities is None:
+            _, self._utilities = next(self.iter_utility_chunks(self.get_size()))
 
-        distribution = min_distance_sum / (i + 1)
+        return self._utilities
 
-        return distribution
+    def iter_utility_chunks(self, chunk_size: int) -> Iterable:
+        """Stream the utilities of all bids in chunks, without holding the complete
+        domain in memory.
 
-    def _dominates(self, bid, candidate_bid):
-        if self.profile_A.get_utility(bid) < self.profile_A.get_utility(candidate_bid):
-            return False
-        elif self.profile_B.get_utility(bid) < self.profile_B.get_utility(
-            candidate_bid
-        ):
-            return False
+        Args:
+            chunk_size (int): number of bids per chunk
+
+        Yields:
+            tuple[int, np.ndarray]: number of the first bid in the chunk and the
+                utilities of the bids in the chunk, see `get_utility_matrix`
+        """
+        issues_values = self.domain["issuesValues"]
+        utility_tables = [
+            profile.get_utility_tables(issues_values)
+            for profile in (self.profile_A, self.profile_B)
+        ]
+        shape, size = self.get_shape(), self.get_size()
+
+        for start in range(0, size, chunk_size):
+            bid_nrs = np.arange(start, min(start + chunk_size, size))
+            bid_matrix = np.unravel_index(bid_nrs, shape)
+            utilities = np.stack(
+                [_sum_utilities(tables, bid_matrix) for tables in utility_tables], axis=1
+            )
+            yield start, utilities
+
+    def get_pareto(self, chunk_size: int = None):
+        if chunk_size is None:
+            pareto_nrs = pareto_indices(self.get_utility_matrix())
+            pareto_utilities = self.get_utility_matrix()[pareto_nrs]
+        else:
+            # running front, merged with the front of every chunk. Ties are broken on the
+            # bid number, so that the result is the same as for the complete domain.
+            pareto_nrs = np.empty(0, dtype=np.int64)
+            pareto_utilities = np.empty((0, 2))
+            for start, utilities in self.iter_utility_chunks(chunk_size):
+                bid_nrs = np.concatenate((pareto_nrs, start + np.arange(len(utilities))))
+                utilities = np.concatenate((pareto_utilities, utilities))
+                pareto = pareto_indices(utilities, bid_nrs)
+                pareto_nrs, pareto_utilities = bid_nrs[pareto], utilities[pareto]
+
+        pareto_front = []
+        for bid_nr, utility in zip(pareto_nrs.tolist(), pareto_utilities.tolist()):
+            pareto_front.append({"bid": self.get_bid(bid_nr), "utility": utility})
+
+        return pareto_front
+
+    def get_distribution(self, chunk_size: int = None) -> float:
+        if not self.pareto_front:
+            raise ValueError("Pareto front not calculated")
+
+        pareto_utilities = np.array([p["utility"] for p in self.pareto_front])
+        pareto_tree = cKDTree(pareto_utilities)
+        k = min(2, len(pareto_utilities))
+
+        if chunk_size is None:
+            chunks = [(0, self.get_utility_matrix())]
         else:
-            return True
+            chunks = self.iter_utility_chunks(chunk_size)
+
+        min_distance_sum = 0.0
+        for _, utilities in chunks:
+            # candidate nearest Pareto elements for all bids at once, the distances are
+            # then computed as in `distance`, so that the metric does not change
+            _, nearest = pareto_tree.query(utilities, k=k)
+            nearest = nearest.reshape(len(utilities), k)
+            differences = pareto_utilities[nearest] - utilities[:, np.newaxis, :]
+            min_distances = np.sqrt(
+                differences[:, :, 0] ** 2 + differences[:, :, 1] ** 2
+            ).min(axis=1)
+            min_distance_sum = sum(min_distances.tolist(), min_distance_sum)
+
+        distribution = min_distance_sum / self.get_size()
+
+        return distribution
 
     def distance_to_pareto(self, bid):
         if not self.pareto_front:
@@ -425,5 +696,56 @@ class Domain:
         return str(self.domain)
 
 
+def _value_names(num_values: int) -> list:
+    # A, B, ..., Z, AA, AB, ... (as spreadsheet columns)
+    names = []
+    for n in range(1, num_values + 1):
+        name = ""
+        while n > 0:
+            n, remainder = divmod(n - 1, 26)
+            name = ascii_uppercase[remainder] + name
+        names.append(name)
+    return names
+
+
+def _sum_utilities(utility_tables: list, bid_matrix: tuple) -> np.ndarray:
+    # add the issues one by one (as `sum` does), so that the result is identical
+    utilities = np.zeros(len(bid_matrix[0]))
+    for utility_table, value_indices in zip(utility_tables, bid_matrix):
+        utilities += utility_table[value_indices]
+    return utilities
+
+
+def pareto_indices(utilities: np.ndarray, bid_ids: np.ndarray = None) -> np.ndarray:
+    """Find the Pareto optimal bids with a sort-and-sweep in O(n log n). Bids are sorted
+    on utility A (descending), a bid is Pareto optimal if its utility B is higher than
+    that of all bids before it. Of bids with identical utilities, only the one with the
+    lowest id is kept.
+
+    Args:
+        utilities (np.ndarray): utilities of the bids, shape (number of bids, 2)
+        bid_ids (np.ndarray, optional): ids that determine which bid is kept when bids
+            have identical utilities. Defaults to None, which uses the row numbers.
+
+    Returns:
+        np.ndarray: row numbers of the Pareto optimal bids, sorted by utility A (ascending)
+    """
+    if bid_ids is None:
+        bid_ids = np.arange(len(utilities))
+
+    # sort on utility A, then utility B (both descending), then bid id (ascending)
+    order = np.lexsort((bid_ids, -utilities[:, 1], -utilities[:, 0]))
+    utilities_B = utilities[order, 1]
+    best_previous_B = np.concatenate(
+        ([-np.inf], np.maximum.accumulate(utilities_B)[:-1])
+    )
+    pareto = order[utilities_B > best_previous_B]
+
+    return pareto[::-1]
+
+
 if __name__ == "__main__":
+    # when run as a script (python utils/create_domains.py), the repository root is not
+    # on the path yet, but the artifacts and index modules are imported from it
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
     main()
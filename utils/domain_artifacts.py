@@ -0,0 +1,121 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from utils.create_domains import Domain, pareto_indices
+
+
+def save_artifacts(domain: Domain, parent_path: str):
+    """Save precomputed binary (.npy) artifacts of a domain next to its JSON files:
+
+    - issues.npy: names of the issues, in the order of the columns of bids.npy
+    - bids.npy: value indices of all bids, in the order of the bid numbers
+    - pareto.npy: bid numbers of the Pareto optimal bids, sorted by utility of profile A
+    - <profile>.utilities.npy: utility of every bid for the profile
+    - <profile>.order.npy: bid numbers sorted on utility for the profile (descending)
+
+    The issues are in sorted order, the canonical order of the agents (see
+    `CompiledUtilitySpace`), and bids are numbered in the (C) order of their value
+    indices. The bid numbers of the artifacts are therefore the same as those of the
+    agents, but differ from the bid numbers of `Domain`, which follow the order of
+    the issues in the domain file.
+
+    Args:
+        domain (Domain): domain to save the artifacts of
+        parent_path (str): directory that holds the domain directories
+    """
+    path = Path(parent_path, domain.get_name())
+
+    issues = list(domain.domain["issuesValues"].keys())
+    axes = sorted(range(len(issues)), key=lambda i: issues[i])
+    shape = domain.get_shape()
+    value_indices = np.unravel_index(
+        np.arange(domain.get_size()), tuple(shape[i] for i in axes)
+    )
+    # number of every bid in the order of the domain file
+    domain_bid_nrs = np.ravel_multi_index(
+        [value_indices[axes.index(i)] for i in range(len(issues))], shape
+    )
+    utilities = domain.get_utility_matrix()[domain_bid_nrs]
+
+    dtype = np.int8 if max(shape) <= 127 else np.int16
+    np.save(path.joinpath("issues.npy"), np.array([issues[i] for i in axes]))
+    np.save(path.joinpath("bids.npy"), np.stack(value_indices, axis=1).astype(dtype))
+    np.save(path.joinpath("pareto.npy"), pareto_indices(utilities))
+
+    for p, profile in enumerate((domain.profile_A, domain.profile_B)):
+        name = profile.profile["LinearAdditiveUtilitySpace"]["name"]
+        np.save(path.joinpath(f"{name}.utilities.npy"), utilities[:, p])
+        np.save(
+            path.joinpath(f"{name}.order.npy"),
+            np.argsort(-utilities[:, p], kind="stable"),
+        )
+
+
+def load_artifacts(profile_uri: str) -> dict:
+    """Load the precomputed artifacts of a profile as memory-mapped arrays, see
+    `save_artifacts`. Artifacts that are older than the profile, or that were saved
+    before the issues were stored in sorted order, are not used.
+
+    Args:
+        profile_uri (str): path or URI of the profile, e.g.
+            "file:domains/domain00/profileA.json"
+
+    Returns:
+        dict: "issues" and their "values" (in the order of the value indices), "bids",
+            "utilities", "order" and "pareto" arrays. None if the artifacts do not
+            exist or are outdated.
+    """
+    profile_path = Path(profile_uri.split(":")[-1])
+    path = profile_path.parent
+    files = {
+        "issues": path.joinpath("issues.npy"),
+        "bids": path.joinpath("bids.npy"),
+        "pareto": path.joinpath("pareto.npy"),
+        "utilities": path.joinpath(f"{profile_path.stem}.utilities.npy"),
+        "order": path.joinpath(f"{profile_path.stem}.order.npy"),
+    }
+    if not all(f.exists() for f in files.values()):
+        return None
+    profile_modified = profile_path.stat().st_mtime_ns
+    if any(f.stat().st_mtime_ns < profile_modified for f in files.values()):
+        return None
+
+    with open(profile_path, "r", encoding="utf-8") as f:
+        profile = json.load(f)
+    issues_values = profile["LinearAdditiveUtilitySpace"]["domain"]["issuesValues"]
+
+    artifacts = {"issues": np.load(files.pop("issues")).tolist()}
+    artifacts["values"] = [issues_values[issue]["values"] for issue in artifacts["issues"]]
+    for key, file in files.items():
+        artifacts[key] = np.load(file, mmap_mode="r")
+
+    return artifacts
+
+
+def get_bid(artifacts: dict, bid_nr: int) -> dict:
+    """Materialise a bid from the artifacts.
+
+    Args:
+        artifacts (dict): artifacts as loaded by `load_artifacts`
+        bid_nr (int): number of the bid, e.g. from the "order" or "pareto" array
+
+    Returns:
+        dict[str, str]: bid dictionary where keys are issues and values are the values
+    """
+    value_indices = artifacts["bids"][bid_nr].tolist()
+    issues_values = zip(artifacts["issues"], artifacts["values"])
+    return {issue: values[j] for (issue, values), j in zip(issues_values, value_indices)}
+
+
+def main(domains_dir: str = "domains"):
+    for directory in sorted(Path(domains_dir).iterdir()):
+        if directory.joinpath("profileA.json").exists():
+            save_artifacts(Domain.from_directory(str(directory)), domains_dir)
+
+
+if __name__ == "__main__":
+    # run from the root of the repository: python -m utils.domain_artifacts [domains_dir]
+    main(*sys.argv[1:])
@@ -0,0 +1,120 @@
+import json
+import math
+import os
+from pathlib import Path
+from typing import Callable, List
+
+from utils.create_domains import Domain
+
+INDEX_FILE = "index.json"
+
+
+def build_index(domains_dir: str = "domains") -> dict:
+    """Build or update the index of all domains in a directory. The index holds the
+    properties of every domain (see `_index_domain`) and is stored as index.json in
+    the domains directory. Only domains of which a file changed since the last build
+    are read again.
+
+    Args:
+        domains_dir (str, optional): directory with a subdirectory per domain.
+            Defaults to "domains".
+
+    Returns:
+        dict: index entries by domain name
+    """
+    index_path = Path(domains_dir, INDEX_FILE)
+    if index_path.exists():
+        with open(index_path, "r", encoding="utf-8") as f:
+            old_index = json.load(f)
+    else:
+        old_index = {}
+
+    index = {}
+    for directory in sorted(Path(domains_dir).iterdir()):
+        if not directory.joinpath("profileA.json").exists():
+            continue
+        name = directory.name
+        modified = max(path.stat().st_mtime_ns for path in directory.glob("*.json"))
+        if name in old_index and old_index[name]["modified"] == modified:
+            index[name] = old_index[name]
+        else:
+            index[name] = _index_domain(directory, modified)
+
+    if index != old_index:
+        # write to a temporary file first, so that an interrupted write never leaves a corrupt index
+        tmp_path = index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(index, indent=2))
+        os.replace(tmp_path, index_path)
+
+    return index
+
+
+def select_profile_sets(
+    predicate: Callable[[dict], bool] = None, domains_dir: str = "domains"
+) -> List[List[str]]:
+    """Select the profile sets of the domains that satisfy a predicate, to be used as
+    "profile_sets" in the tournament settings. For example, all large and opposed
+    domains: `select_profile_sets(lambda d: d["size"] > 5000 and d["opposition"] > 0.5)`
+
+    Args:
+        predicate (Callable[[dict], bool], optional): function of an index entry that
+            returns True if the domain is selected. Defaults to None (all domains).
+        domains_dir (str, optional): directory with a subdirectory per domain.
+            Defaults to "domains".
+
+    Returns:
+        list[list[str]]: paths of profile A and B of every selected domain
+    """
+    index = build_index(domains_dir)
+    return [
+        entry["profiles"]
+        for entry in index.values()
+        if predicate is None or predicate(entry)
+    ]
+
+
+def _index_domain(directory: Path, modified: int) -> dict:
+    with open(directory.joinpath("profileA.json"), "r", encoding="utf-8") as f:
+        profile = json.load(f)
+    issues_values = profile["LinearAdditiveUtilitySpace"]["domain"]["issuesValues"]
+
+    specials_path = directory.joinpath("specials.json")
+    if specials_path.exists():
+        with open(specials_path, "r", encoding="utf-8") as f:
+            specials = json.load(f)
+    else:
+        specials = {}
+
+    distribution = specials.get("distribution")
+    if distribution is None:
+        # older domains have no distribution in their specials, it is computed here
+        domain = Domain.from_directory(str(directory))
+        if domain.pareto_front:
+            distribution = domain.get_distribution()
+        else:
+            domain.calculate_specials()
+            distribution = domain.distribution
+        specials.setdefault("opposition", domain.opposition)
+        specials.setdefault("nash", domain.nash_bid)
+        specials.setdefault("kalai", domain.kalai_bid)
+
+    nash, kalai = specials.get("nash"), specials.get("kalai")
+    return {
+        "name": directory.name,
+        "profiles": [
+            directory.joinpath("profileA.json").as_posix(),
+            directory.joinpath("profileB.json").as_posix(),
+        ],
+        "size": math.prod(len(v["values"]) for v in issues_values.values()),
+        "num_issues": len(issues_values),
+        "opposition": specials.get("opposition"),
+        "distribution": distribution,
+        "nash_utility": nash["utility"] if nash else None,
+        "kalai_utility": kalai["utility"] if kalai else None,
+        "modified": modified,
+    }
+
+
+if __name__ == "__main__":
+    print(f"indexed {len(build_index())} domains")
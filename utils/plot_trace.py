@@ -1,10 +1,17 @@
 import os
 from collections import defaultdict
+from typing import Union
 
 import plotly.graph_objects as go
 
+from utils.trace_stream import read_trace
+
+
+def plot_trace(results_trace: Union[dict, str], plot_file: str):
+    # a path refers to a streamed trace file, its actions are read lazily
+    if not isinstance(results_trace, dict):
+        results_trace = read_trace(results_trace)
 
-def plot_trace(results_trace: dict, plot_file: str):
     utilities = defaultdict(lambda: defaultdict(lambda: {"x": [], "y": [], "bids": []}))
     accept = {"x": [], "y": [], "bids": []}
     for index, action in enumerate(results_trace["actions"], 1):
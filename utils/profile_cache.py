@@ -0,0 +1,60 @@
+import os
+from typing import Dict, Tuple
+
+from geniusweb.profile.utilityspace.LinearAdditiveUtilitySpace import (
+    LinearAdditiveUtilitySpace,
+)
+from geniusweb.profileconnection.ProfileConnectionFactory import (
+    ProfileConnectionFactory,
+)
+from geniusweb.simplerunner.NegoRunner import StdOutReporter
+from uri.uri import URI
+
+# process-wide cache of parsed profiles, maps a profile URI to (file mtime, profile)
+_profiles: Dict[str, Tuple[int, LinearAdditiveUtilitySpace]] = {}
+
+
+def get_profile(profile_uri: str) -> LinearAdditiveUtilitySpace:
+    """Load a profile, or return it from the cache if it was loaded before. Profiles
+    that are stored in a file are reloaded when the modification time of the file
+    changed.
+
+    Args:
+        profile_uri (str): URI of the profile, e.g. "file:domains/domain00/profileA.json"
+
+    Returns:
+        LinearAdditiveUtilitySpace: the profile
+    """
+    mtime = _get_mtime(profile_uri)
+    if profile_uri in _profiles and _profiles[profile_uri][0] == mtime:
+        return _profiles[profile_uri][1]
+
+    profile_connection = ProfileConnectionFactory.create(
+        URI(profile_uri), StdOutReporter()
+    )
+    profile = profile_connection.getProfile()
+    profile_connection.close()
+    assert isinstance(profile, LinearAdditiveUtilitySpace)
+
+    _profiles[profile_uri] = (mtime, profile)
+
+    return profile
+
+
+def invalidate_profiles(profile_uri: str = None):
+    """Remove a profile from the cache, or clear the complete cache.
+
+    Args:
+        profile_uri (str, optional): URI of the profile to remove. Defaults to None,
+            which clears all profiles.
+    """
+    if profile_uri is None:
+        _profiles.clear()
+    else:
+        _profiles.pop(profile_uri, None)
+
+
+def _get_mtime(profile_uri: str) -> int:
+    if not profile_uri.startswith("file:"):
+        return None
+    return os.stat(profile_uri[len("file:"):]).st_mtime_ns
@@ -0,0 +1,226 @@
+import json
+import os
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# log of the summaries that are not written to a part yet
+PENDING_FILE = "pending.jsonl"
+
+# columns of a session summary in the columnar layout
+COLUMNS = (
+    "agent_1",
+    "agent_2",
+    "utility_1",
+    "utility_2",
+    "nash_product",
+    "social_welfare",
+    "num_offers",
+    "result",
+)
+
+
+class ResultStore:
+    """Append-only columnar store of tournament session summaries. Summaries are
+    buffered and written as parts (one compressed .npz file per part, one array per
+    column), so the store can grow while the tournament is running and is loaded as a
+    DataFrame without parsing any JSON. Every appended summary is also written to a
+    small pending log right away, so that the summaries of a part that was not written
+    yet are recovered when the store is opened again after a crash.
+
+    Sessions are identified by a key (see `TournamentJournal.key`). When a session is
+    stored more than once, for example by rerunning a tournament into the same store,
+    only its last summary is loaded.
+
+    A ResultStore is the writer of a store, it writes the recovered summaries to a part
+    when it is closed. Use `load_results` to read a store without modifying it.
+
+    Args:
+        directory (str): directory that holds the parts of the store
+        part_size (int, optional): number of sessions per part. Defaults to 10000.
+    """
+
+    def __init__(self, directory: str, part_size: int = 10000):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.part_size = part_size
+        self._buffer = []
+        self._buffer_keys = set()
+
+        # keys of the sessions in the written parts
+        self._keys = set()
+        for part in self.directory.glob("part-*.npz"):
+            with np.load(part) as data:
+                if "session" in data.files:
+                    self._keys.update(data["session"].tolist())
+
+        # recover the summaries that were appended but not written to a part, the
+        # pending log is only rewritten when the store is written to
+        self._pending_path = self.directory.joinpath(PENDING_FILE)
+        self._pending = None
+        for key, summary in _read_pending(self._pending_path):
+            self._buffer.append((key, summary))
+            self._buffer_keys.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys or key in self._buffer_keys
+
+    def append(self, session_results_summary: dict, key: str = ""):
+        """Append a session summary to the store.
+
+        Args:
+            session_results_summary (dict): session summary as returned by `run_session`
+            key (str, optional): key that identifies the session. Defaults to "" (no
+                key, the summary is never replaced).
+        """
+        if self._pending is None:
+            self._pending = self._write_pending()
+        self._buffer.append((key, session_results_summary))
+        self._buffer_keys.add(key)
+        self._pending.write(json.dumps({"key": key, "summary": session_results_summary}) + "\n")
+        self._pending.flush()
+        if len(self._buffer) >= self.part_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+
+        frame = _buffer_to_frame(self._buffer)
+        part = len(list(self.directory.glob("part-*.npz")))
+        # write to a temporary file first, so that an interrupted write never leaves a corrupt part
+        tmp_path = self.directory.joinpath(f"tmp-{part:06d}.npz")
+        np.savez_compressed(
+            tmp_path, **{column: _to_array(frame[column]) for column in frame.columns}
+        )
+        os.replace(tmp_path, self.directory.joinpath(f"part-{part:06d}.npz"))
+
+        self._keys.update(self._buffer_keys)
+        self._buffer = []
+        self._buffer_keys = set()
+        if self._pending is not None:
+            self._pending.close()
+        self._pending = self._write_pending()
+
+    def to_frame(self) -> pd.DataFrame:
+        """Load all stored session summaries (including the ones not yet flushed).
+
+        Returns:
+            pd.DataFrame: one row per session, its "session" key followed by COLUMNS
+        """
+        return _combine_frames(self.directory, self._buffer)
+
+    def close(self):
+        self.flush()
+        if self._pending is not None:
+            self._pending.close()
+
+    def _write_pending(self):
+        # (re)write the pending log with the buffered summaries, which drops an incomplete last line
+        pending = open(self._pending_path, "w", encoding="utf-8")
+        for key, summary in self._buffer:
+            pending.write(json.dumps({"key": key, "summary": summary}) + "\n")
+        pending.flush()
+        return pending
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_results(directory: str) -> pd.DataFrame:
+    """Load all session summaries of a store (including the ones in the pending log),
+    without modifying the store. Safe to use while a tournament writes to the store.
+
+    Args:
+        directory (str): directory that holds the parts of the store
+
+    Returns:
+        pd.DataFrame: one row per session, see `ResultStore.to_frame`
+    """
+    buffer = list(_read_pending(Path(directory, PENDING_FILE)))
+    return _combine_frames(Path(directory), buffer)
+
+
+def _read_pending(path: Path):
+    if not path.exists():
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # last line can be incomplete if the tournament was killed while writing
+                continue
+            yield entry["key"], entry["summary"]
+
+
+def _combine_frames(directory: Path, buffer: list) -> pd.DataFrame:
+    # frames of the parts and the buffered (key, summary) pairs, in the order they were stored
+    frames = []
+    for part in sorted(directory.glob("part-*.npz")):
+        with np.load(part) as data:
+            frame = pd.DataFrame({column: data[column] for column in COLUMNS})
+            # parts written before sessions had a key
+            frame.insert(0, "session", data["session"] if "session" in data.files else "")
+            frames.append(frame)
+    frames.append(_buffer_to_frame(buffer))
+    frame = pd.concat(frames, ignore_index=True)
+
+    # keep the last summary of every session that was stored more than once
+    replaced = frame["session"].ne("") & frame["session"].duplicated(keep="last")
+    return frame[~replaced].reset_index(drop=True)
+
+
+def _buffer_to_frame(buffer: list) -> pd.DataFrame:
+    frame = results_to_frame([summary for _, summary in buffer])
+    frame.insert(0, "session", pd.Series([key for key, _ in buffer], dtype=str))
+    return frame
+
+
+def _to_array(column: pd.Series) -> np.ndarray:
+    # strings are stored as fixed-width unicode, object arrays would require pickling
+    if not pd.api.types.is_numeric_dtype(column):
+        return np.array(column.tolist(), dtype=str)
+    return column.to_numpy()
+
+
+def results_to_frame(tournament_results: List[dict]) -> pd.DataFrame:
+    """Convert session summaries as returned by `run_session` to the columnar layout.
+    The agents of a session are numbered 1 and 2 in the order of their position. A
+    session that has less than two agents (e.g. an ERROR before the agents connected)
+    gets an empty agent name and a NaN utility for the missing positions.
+
+    Args:
+        tournament_results (list[dict]): session summaries
+
+    Returns:
+        pd.DataFrame: one row per session, see COLUMNS
+    """
+    columns = {column: [] for column in COLUMNS}
+    for session_results in tournament_results:
+        positions = sorted(
+            (k.split("_")[1] for k in session_results if k.startswith("agent")), key=int
+        )
+        for i in range(1, 3):
+            if i <= len(positions):
+                columns[f"agent_{i}"].append(session_results[f"agent_{positions[i - 1]}"])
+                columns[f"utility_{i}"].append(session_results[f"utility_{positions[i - 1]}"])
+            else:
+                columns[f"agent_{i}"].append("")
+                columns[f"utility_{i}"].append(np.nan)
+        for column in ("nash_product", "social_welfare", "result"):
+            columns[column].append(session_results[column])
+        columns["num_offers"].append(session_results.get("num_offers", np.nan))
+
+    frame = pd.DataFrame(columns)
+    for column in ("utility_1", "utility_2", "nash_product", "social_welfare", "num_offers"):
+        frame[column] = frame[column].astype(float)
+    for column in ("agent_1", "agent_2", "result"):
+        frame[column] = frame[column].astype(str)
+
+    return frame
@@ -1,38 +1,68 @@
+import multiprocessing
+import os
 import shutil
-from collections import defaultdict
+from collections import Counter
+from copy import deepcopy
+from functools import partial
 from itertools import permutations
 from math import factorial, prod
 from pathlib import Path
-from typing import Tuple
+from typing import List, Tuple, Union
 
+import numpy as np
 import pandas as pd
+from geniusweb.actions.Accept import Accept
+from geniusweb.actions.Action import Action
+from geniusweb.actions.Offer import Offer
 from geniusweb.profile.utilityspace.LinearAdditiveUtilitySpace import (
     LinearAdditiveUtilitySpace,
 )
-from geniusweb.profileconnection.ProfileConnectionFactory import (
-    ProfileConnectionFactory,
-)
 from geniusweb.protocol.NegoSettings import NegoSettings
 from geniusweb.protocol.session.saop.SAOPState import SAOPState
 from geniusweb.simplerunner.ClassPathConnectionFactory import ClassPathConnectionFactory
 from geniusweb.simplerunner.NegoRunner import StdOutReporter
 from geniusweb.simplerunner.Runner import Runner
 from pyson.ObjectMapper import ObjectMapper
-from uri.uri import URI
 
 from utils.ask_proceed import ask_proceed
+from utils.profile_cache import get_profile
+from utils.result_store import ResultStore, results_to_frame
+from utils.saop_engine import SAOPEngine
+from utils.session_cache import SessionCache
+from utils.tournament_journal import TournamentJournal
+from utils.trace_columns import save_traces
+from utils.trace_stream import read_trace, write_trace
+from utils.utility_evaluator import UtilityEvaluator, verify_utilities
+from utils.virtual_clock import VirtualClock, WallClock
+
+# optional session settings that a tournament passes on to every session
+SESSION_OPTIONS = (
+    "engine",
+    "time_mode",
+    "turn_cost_ms",
+    "measure_compute",
+    "verify_utilities",
+)
 
 
-def run_session(settings) -> Tuple[dict, dict]:
+def run_session(
+    settings, trace: bool = True, trace_file: str = None
+) -> Tuple[dict, dict]:
     agents = settings["agents"]
     profiles = settings["profiles"]
     deadline_time_ms = settings["deadline_time_ms"]
+    engine = settings.get("engine", "runner")
+    time_mode = settings.get("time_mode", "real")
+    # check the compiled utilities of the trace against the Decimal utilities of geniusweb
+    verify = settings.get("verify_utilities", False)
 
     # quick and dirty checks
     assert isinstance(agents, list) and len(agents) == 2
     assert isinstance(profiles, list) and len(profiles) == 2
     assert isinstance(deadline_time_ms, int) and deadline_time_ms > 0
     assert all(["class" in agent for agent in agents])
+    assert engine in ("runner", "direct")
+    assert time_mode in ("real", "virtual")
 
     for agent in agents:
         if "parameters" in agent:
@@ -44,6 +74,68 @@ def run_session(settings) -> Tuple[dict, dict]:
     # file path to uri
     profiles_uri = [f"file:{x}" for x in profiles]
 
+    # the virtual clock is only supported by the in-process engine
+    if engine == "direct" or time_mode == "virtual":
+        if time_mode == "virtual":
+            # the clock only advances by the compute time of the agents plus a fixed cost per turn
+            clock = VirtualClock(
+                turn_cost_ms=settings.get("turn_cost_ms", 1.0),
+                measure_compute=settings.get("measure_compute", True),
+            )
+        else:
+            clock = WallClock()
+
+        # run the negotiation session in-process, without the geniusweb Runner
+        saop_engine = SAOPEngine(agents, profiles_uri, deadline_time_ms, clock)
+        saop_engine.run()
+
+        results_class = saop_engine
+        party_ids = [party_id.getName() for party_id in saop_engine.party_ids]
+        error = saop_engine.error
+    else:
+        # run the negotiation session with the geniusweb Runner
+        results_class = _run_runner_session(agents, profiles_uri, deadline_time_ms)
+        party_ids = [conn.getParty().getName() for conn in results_class.getConnections()]
+        error = results_class.getError()
+
+    # only create a summary from the final actions, skip serialising the full trace
+    if not trace:
+        return None, summarise_results(
+            results_class.getActions(), party_ids, agents, profiles_uri
+        )
+
+    # stream the trace to disk in chunks, instead of building the full trace in memory
+    if trace_file is not None:
+        actions = results_class.getActions()
+        write_trace(
+            trace_file,
+            actions,
+            party_ids,
+            agents,
+            profiles_uri,
+            error=None if error is None else str(error),
+            verify=verify,
+        )
+        results_summary = summarise_results(actions, party_ids, agents, profiles_uri)
+        return read_trace(trace_file), results_summary
+
+    # get results from the session in dict format
+    if isinstance(results_class, SAOPEngine):
+        results_dict = results_class.to_dict()
+    else:
+        results_dict: dict = ObjectMapper().toJson(results_class)["SAOPState"]
+
+    # add utilities to the results and create a summary
+    results_trace, results_summary = process_results(
+        results_class, results_dict, verify=verify
+    )
+
+    return results_trace, results_summary
+
+
+def _run_runner_session(
+    agents: List[dict], profiles_uri: List[str], deadline_time_ms: int
+) -> SAOPState:
     # create full settings dictionary that geniusweb requires
     settings_full = {
         "SAOPSettings": {
@@ -93,25 +185,24 @@ def run_session(settings) -> Tuple[dict, dict]:
     # run the negotiation session
     runner.run()
 
-    # get results from the session in class format and dict format
-    results_class: SAOPState = runner.getProtocol().getState()
-    results_dict: dict = ObjectMapper().toJson(results_class)["SAOPState"]
-
-    # add utilities to the results and create a summary
-    results_trace, results_summary = process_results(results_class, results_dict)
-
-    return results_trace, results_summary
+    # get results from the session in class format
+    return runner.getProtocol().getState()
 
 
-def run_tournament(tournament_settings: dict) -> Tuple[list, list]:
+def run_tournament(tournament_settings: dict) -> Tuple[list, list, pd.DataFrame]:
     # create agent permutations, ensures that every agent plays against every other agent on both sides of a profile set.
     agents = tournament_settings["agents"]
     profile_sets = tournament_settings["profile_sets"]
     deadline_time_ms = tournament_settings["deadline_time_ms"]
+    parallel = tournament_settings.get("parallel", False)
+    num_workers = tournament_settings.get("num_workers") or os.cpu_count()
+    trace_dir = tournament_settings.get("trace_dir")
+    session_options = {
+        k: v for k, v in tournament_settings.items() if k in SESSION_OPTIONS
+    }
 
-    num_sessions = (factorial(len(agents)) // factorial(len(agents) - 2)) * len(
-        profile_sets
-    )
+    sessions_per_set = factorial(len(agents)) // factorial(len(agents) - 2)
+    num_sessions = sessions_per_set * len(profile_sets)
     if num_sessions > 100:
         message = (
             f"WARNING: this would run {num_sessions} negotiation sessions. Proceed?"
@@ -120,7 +211,6 @@ def run_tournament(tournament_settings: dict) -> Tuple[list, list]:
             print("Exiting script")
             exit()
 
-    tournament_results = []
     tournament_steps = []
     for profiles in profile_sets:
         # quick an dirty check
@@ -131,21 +221,166 @@ def run_tournament(tournament_settings: dict) -> Tuple[list, list]:
                 "agents": list(agent_duo),
                 "profiles": profiles,
                 "deadline_time_ms": deadline_time_ms,
+                **session_options,
             }
+            tournament_steps.append(settings)
+
+    tournament_results = [None] * len(tournament_steps)
+    journal = None
+    if "journal" in tournament_settings:
+        # sessions that are already in the journal (from an interrupted run) are not run again
+        journal = TournamentJournal(tournament_settings["journal"])
+        for i, settings in enumerate(tournament_steps):
+            if settings in journal:
+                tournament_results[i] = journal.get(settings)
+    cache = None
+    if "cache_dir" in tournament_settings:
+        # sessions of which the agents, profiles and settings did not change are not run again
+        cache = SessionCache(tournament_settings["cache_dir"])
+    result_store = None
+    if "result_store" in tournament_settings:
+        # summaries are also appended to a columnar store for large scale analysis
+        result_store = ResultStore(tournament_settings["result_store"])
+
+    if result_store is not None:
+        # sessions of the journal are stored as well, unless a previous run already did
+        for i, settings in enumerate(tournament_steps):
+            key = TournamentJournal.key(settings)
+            if tournament_results[i] is not None and key not in result_store:
+                result_store.append(tournament_results[i], key)
+
+    def record_result(i: int, session_results_summary: dict, cached: bool = False):
+        tournament_results[i] = session_results_summary
+        if result_store is not None:
+            result_store.append(
+                session_results_summary, TournamentJournal.key(tournament_steps[i])
+            )
+        if journal is not None:
+            journal.append(tournament_steps[i], session_results_summary)
+        if cache is not None and not cached:
+            cache.put(tournament_steps[i], session_results_summary)
+
+    if cache is not None:
+        for i, settings in enumerate(tournament_steps):
+            if tournament_results[i] is None:
+                session_results_summary = cache.get(settings)
+                if session_results_summary is not None:
+                    record_result(i, session_results_summary, cached=True)
+
+    pending_steps = [
+        (i, settings)
+        for i, settings in enumerate(tournament_steps)
+        if tournament_results[i] is None
+    ]
+
+    if trace_dir is not None:
+        Path(trace_dir).mkdir(parents=True, exist_ok=True)
+    # traces are archived in one file per profile set, which is written as soon as all
+    # sessions of the set that are run have finished
+    set_traces = {}
+    set_remaining = Counter(i // sessions_per_set for i, _ in pending_steps)
+
+    def archive_trace(i: int, session_results_trace: dict):
+        profile_set = i // sessions_per_set
+        set_traces.setdefault(profile_set, {})[i] = session_results_trace
+        set_remaining[profile_set] -= 1
+        if set_remaining[profile_set] == 0:
+            traces = set_traces.pop(profile_set)
+            save_traces(
+                _trace_archive_path(trace_dir, profile_set),
+                [traces[j] for j in sorted(traces)],
+            )
 
+    if parallel and num_workers > 1:
+        # every worker process gets its own storage namespace, so that agents that
+        # learn from stored data never write to the same files concurrently.
+        worker_counter = multiprocessing.Value("i", 0)
+        with multiprocessing.Pool(
+            num_workers, initializer=_init_worker, initargs=(worker_counter,)
+        ) as pool:
+            sessions_iter = pool.imap_unordered(
+                partial(_run_session_in_worker, keep_trace=trace_dir is not None),
+                pending_steps,
+                chunksize=1,
+            )
+            # results are placed by their step index, so the order is the same as a serial run
+            for i, session_results_trace, session_results_summary in sessions_iter:
+                record_result(i, session_results_summary)
+                if trace_dir is not None:
+                    archive_trace(i, session_results_trace)
+    else:
+        for i, settings in pending_steps:
             # run a single negotiation session
-            _, session_results_summary = run_session(settings)
+            session_results_trace, session_results_summary = _run_tournament_session(
+                settings, keep_trace=trace_dir is not None
+            )
+            record_result(i, session_results_summary)
+            if trace_dir is not None:
+                archive_trace(i, session_results_trace)
 
-            # assemble results
-            tournament_steps.append(settings)
-            tournament_results.append(session_results_summary)
+    if journal is not None:
+        journal.close()
+    if result_store is not None:
+        result_store.close()
 
     tournament_results_summary = process_tournament_results(tournament_results)
 
     return tournament_steps, tournament_results, tournament_results_summary
 
 
-def process_results(results_class: SAOPState, results_dict: dict):
+# index of the current tournament worker process, set by the pool initializer
+_worker_id = None
+
+
+def _init_worker(worker_counter):
+    global _worker_id
+    with worker_counter.get_lock():
+        _worker_id = worker_counter.value
+        worker_counter.value += 1
+
+
+def _run_session_in_worker(
+    step: Tuple[int, dict], keep_trace: bool = False
+) -> Tuple[int, dict, dict]:
+    """Runs a single session inside a tournament worker process. The `storage_dir` of
+    every agent is moved into a subdirectory that is unique for this worker.
+
+    Args:
+        step (Tuple[int, dict]): index of the session in the tournament and the session
+            settings as created by `run_tournament`
+        keep_trace (bool, optional): return the session trace, to be archived by the
+            main process. Defaults to False.
+
+    Returns:
+        Tuple[int, dict, dict]: index of the session, session results trace (None if it
+            is not kept) and session results summary
+    """
+    i, settings = step
+    settings = deepcopy(settings)
+    for agent in settings["agents"]:
+        if "storage_dir" in agent.get("parameters", {}):
+            storage_dir = Path(agent["parameters"]["storage_dir"], f"worker_{_worker_id}")
+            agent["parameters"]["storage_dir"] = str(storage_dir)
+
+    return (i, *_run_tournament_session(settings, keep_trace))
+
+
+def _run_tournament_session(settings: dict, keep_trace: bool = False) -> Tuple[dict, dict]:
+    # the trace is only created if it is archived, otherwise only the summary is computed
+    return run_session(settings, trace=keep_trace)
+
+
+def _trace_archive_path(trace_dir: str, profile_set: int) -> Path:
+    # a rerun of the tournament adds a file for the sessions it runs of the profile set
+    path = Path(trace_dir, f"profile_set_{profile_set:05d}.npz")
+    part = 1
+    while path.exists():
+        path = Path(trace_dir, f"profile_set_{profile_set:05d}-{part}.npz")
+        part += 1
+    return path
+
+
+def process_results(results_class: SAOPState, results_dict: dict, verify: bool = False):
     # dict to translate geniusweb agent reference to Python class name
     agent_translate = {
         k: v["party"]["partyref"].split(".")[-1]
@@ -165,6 +400,8 @@ def process_results(results_class: SAOPState, results_dict: dict):
         # iterate both action classes and dict entries
         actions_iter = zip(results_class.getActions(), results_dict["actions"])
 
+        offers = []
+        bids = []
         for action_class, action_dict in actions_iter:
             if "Offer" in action_dict:
                 offer = action_dict["Offer"]
@@ -173,19 +410,28 @@ def process_results(results_class: SAOPState, results_dict: dict):
             else:
                 continue
 
-            # add bid utility of both agents if bid is not None
+            # bid utilities of both agents are added below
             bid = action_class.getBid()
             if bid is None:
                 raise ValueError(
                     f"Found `None` value in sequence of actions: {action_class}"
                 )
-            else:
-                offer["utilities"] = {
-                    k: float(v.getUtility(bid)) for k, v in utility_funcs.items()
-                }
+            offers.append(offer)
+            bids.append(bid)
 
             results_summary["num_offers"] += 1
 
+        # compute the utilities of all bids for both agents in one go
+        evaluator = UtilityEvaluator(list(utility_funcs.values()))
+        bid_matrix = evaluator.encode([offer["bid"]["issuevalues"] for offer in offers])
+        utilities = evaluator.utilities(bid_matrix).tolist()
+        for offer, bid_utilities in zip(offers, utilities):
+            offer["utilities"] = dict(zip(utility_funcs.keys(), bid_utilities))
+
+        # verify the compiled utilities against the (slow) Decimal utilities of geniusweb
+        if verify:
+            verify_utilities(offers, bids, utility_funcs)
+
         # gather a summary of results
         if "Accept" in action_dict:
             utilities_final = list(offer["utilities"].values())
@@ -208,43 +454,96 @@ def process_results(results_class: SAOPState, results_dict: dict):
     return results_dict, results_summary
 
 
-def get_utility_function(profile_uri) -> LinearAdditiveUtilitySpace:
-    profile_connection = ProfileConnectionFactory.create(
-        URI(profile_uri), StdOutReporter()
-    )
-    profile = profile_connection.getProfile()
-    assert isinstance(profile, LinearAdditiveUtilitySpace)
+def summarise_results(
+    actions: List[Action], party_ids: List[str], agents: List[dict], profiles_uri: List[str]
+) -> dict:
+    """Create the results summary of a session directly from its actions, without
+    serialising and annotating the full trace as `process_results` does.
 
-    return profile
+    Args:
+        actions (list[Action]): actions of the session
+        party_ids (list[str]): party ids of the agents, in the same order as `agents`
+        agents (list[dict]): agent settings of the session
+        profiles_uri (list[str]): profile URIs of the agents
 
+    Returns:
+        dict: results summary
+    """
+    results_summary = {
+        "num_offers": sum(isinstance(action, (Offer, Accept)) for action in actions)
+    }
 
-def process_tournament_results(tournament_results):
-    agent_result_raw = defaultdict(lambda: defaultdict(list))
-    tournament_results_summary = defaultdict(lambda: defaultdict(int))
-    for session_results in tournament_results:
-        agents = {k: v for k, v in session_results.items() if k.startswith("agent")}
-        for agent_id, agent_class in agents.items():
-            agent_result_raw[agent_class]["utility"].append(
-                session_results[f"utility_{agent_id.split('_')[1]}"]
-            )
-            agent_result_raw[agent_class]["nash_product"].append(
-                session_results["nash_product"]
-            )
-            agent_result_raw[agent_class]["social_welfare"].append(
-                session_results["social_welfare"]
-            )
-            if "num_offers" in session_results:
-                agent_result_raw[agent_class]["num_offers"].append(
-                    session_results["num_offers"]
-                )
-            tournament_results_summary[agent_class][session_results["result"]] += 1
+    # check if there are any actions (could have crashed)
+    if actions:
+        if isinstance(actions[-1], Accept):
+            bid = actions[-1].getBid()
+            utilities_final = [
+                float(get_utility_function(profile_uri).getUtility(bid))
+                for profile_uri in profiles_uri
+            ]
+            result = "agreement"
+        else:
+            utilities_final = [0, 0]
+            result = "failed"
+    else:
+        utilities_final = [0, 0]
+        result = "ERROR"
+
+    for party_id, agent, utility in zip(party_ids, agents, utilities_final):
+        position = party_id.split("_")[-1]
+        results_summary[f"agent_{position}"] = agent["class"].split(".")[-1]
+        results_summary[f"utility_{position}"] = utility
+    results_summary["nash_product"] = prod(utilities_final)
+    results_summary["social_welfare"] = sum(utilities_final)
+    results_summary["result"] = result
 
-    for agent, stats in agent_result_raw.items():
-        num_session = len(stats["utility"])
-        for desc, stat in stats.items():
-            stat_average = sum(stat) / num_session
-            tournament_results_summary[agent][f"avg_{desc}"] = stat_average
-        tournament_results_summary[agent]["count"] = num_session
+    return results_summary
+
+
+def get_utility_function(profile_uri) -> LinearAdditiveUtilitySpace:
+    # profiles are parsed once per process and shared between sessions
+    return get_profile(profile_uri)
+
+
+def process_tournament_results(
+    tournament_results: Union[List[dict], pd.DataFrame]
+) -> pd.DataFrame:
+    # session summaries in columnar layout, one row per session
+    if isinstance(tournament_results, pd.DataFrame):
+        sessions = tournament_results
+    else:
+        sessions = results_to_frame(tournament_results)
+
+    # one row per agent per session
+    session_columns = ["nash_product", "social_welfare", "num_offers", "result"]
+    agent_sessions = pd.concat(
+        [
+            sessions[[f"agent_{i}", f"utility_{i}"] + session_columns].rename(
+                columns={f"agent_{i}": "agent", f"utility_{i}": "utility"}
+            )
+            for i in (1, 2)
+        ],
+        ignore_index=True,
+    )
+    # positions without an agent, see `results_to_frame`
+    agent_sessions = agent_sessions[agent_sessions["agent"] != ""]
+
+    stats = ["utility", "nash_product", "social_welfare", "num_offers"]
+    grouped = agent_sessions.groupby("agent")
+    count = grouped.size()
+    stats_std = grouped[stats[:3]].std()
+    tournament_results_summary = pd.concat(
+        [
+            grouped[stats].mean().add_prefix("avg_"),
+            count.rename("count"),
+            pd.crosstab(agent_sessions["agent"], agent_sessions["result"]),
+            stats_std.add_prefix("std_"),
+            # half width of the 95% confidence interval of the mean
+            (1.96 * stats_std.div(np.sqrt(count), axis=0)).add_prefix("ci95_"),
+        ],
+        axis=1,
+    )
+    tournament_results_summary.index.name = None
 
     column_order = [
         "avg_utility",
@@ -255,6 +554,12 @@ def process_tournament_results(tournament_results):
         "agreement",
         "failed",
         "ERROR",
+        "std_utility",
+        "ci95_utility",
+        "std_nash_product",
+        "ci95_nash_product",
+        "std_social_welfare",
+        "ci95_social_welfare",
     ]
     column_type = {
         "count": int,
@@ -263,9 +568,6 @@ def process_tournament_results(tournament_results):
         "ERROR": int,
     }
 
-    # results dictionary to dataframe
-    tournament_results_summary = pd.DataFrame(tournament_results_summary).T
-
     # clean data and types
     tournament_results_summary = tournament_results_summary.fillna(0)
     for column in column_order:
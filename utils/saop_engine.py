@@ -0,0 +1,306 @@
+import importlib
+from decimal import Decimal
+from time import perf_counter
+from typing import List, Union
+
+from geniusweb.actions.Accept import Accept
+from geniusweb.actions.Action import Action
+from geniusweb.actions.EndNegotiation import EndNegotiation
+from geniusweb.actions.Offer import Offer
+from geniusweb.actions.PartyId import PartyId
+from geniusweb.inform.ActionDone import ActionDone
+from geniusweb.inform.Agreements import Agreements
+from geniusweb.inform.Finished import Finished
+from geniusweb.inform.Inform import Inform
+from geniusweb.inform.Settings import Settings
+from geniusweb.inform.YourTurn import YourTurn
+from geniusweb.issuevalue.Bid import Bid
+from geniusweb.party.DefaultParty import DefaultParty
+from geniusweb.references.Parameters import Parameters
+from geniusweb.references.ProfileRef import ProfileRef
+from geniusweb.references.ProtocolRef import ProtocolRef
+from uri.uri import URI
+
+from utils.virtual_clock import VirtualClock, WallClock
+
+
+class SAOPEngine:
+    """Runs a bilateral SAOP negotiation session in-process on a single thread. The
+    parties are instantiated directly and all information is delivered through
+    method calls, so there are no connection threads and no JSON serialisation of
+    the protocol state. Actions are recorded in a compact ActionLog.
+
+    Args:
+        agents (list[dict]): agent settings, see `run_session`
+        profiles_uri (list[str]): profile URIs, one for every agent
+        deadline_time_ms (int): deadline of the session in milliseconds
+        clock (Union[WallClock, VirtualClock], optional): clock that tracks the session
+            time. Defaults to a WallClock.
+    """
+
+    def __init__(
+        self,
+        agents: List[dict],
+        profiles_uri: List[str],
+        deadline_time_ms: int,
+        clock: Union[WallClock, VirtualClock] = None,
+    ):
+        self.agents = agents
+        self.profiles_uri = profiles_uri
+        self.deadline_time_ms = deadline_time_ms
+        self.clock = WallClock() if clock is None else clock
+        self.progress = self.clock.create_progress(deadline_time_ms)
+
+        self.party_ids: List[PartyId] = []
+        self.parties: List[DefaultParty] = []
+        self.log: ActionLog = None
+        self.agreement: Bid = None
+        self.error = None
+        self._received: Action = None
+        # party whose turn it is, None between turns
+        self._turn: PartyId = None
+        self._finished = False
+
+    def run(self):
+        for i, agent in enumerate(self.agents, 1):
+            module_name, class_name = agent["class"].rsplit(".", 1)
+            party_class = getattr(importlib.import_module(module_name), class_name)
+            party: DefaultParty = party_class()
+            party_id = PartyId(f"{class_name}_{i}")
+            party.connect(_DirectConnection(party_id, self))
+            self.party_ids.append(party_id)
+            self.parties.append(party)
+        self.log = ActionLog(self.party_ids)
+
+        for party_id, party, agent, profile_uri in zip(
+            self.party_ids, self.parties, self.agents, self.profiles_uri
+        ):
+            settings = Settings(
+                party_id,
+                ProfileRef(URI(profile_uri)),
+                ProtocolRef(URI("SAOP")),
+                self.progress,
+                Parameters(agent.get("parameters", {})),
+            )
+            self._deliver(party, settings)
+
+        turn = 0
+        last_offer: Offer = None
+        while self.error is None and not self._past_deadline():
+            self._received = None
+            self._turn = self.party_ids[turn]
+            self._deliver(self.parties[turn], YourTurn())
+            self._turn = None
+            self.clock.end_turn()
+            action, self._received = self._received, None
+
+            if self.error is not None:
+                break
+            if action is None:
+                self.error = f"{self.party_ids[turn]} did not act on its turn"
+                break
+            # actions that arrive after the deadline are ignored
+            if self._past_deadline():
+                break
+            if action.getActor() != self.party_ids[turn]:
+                self.error = f"{action} was not sent by {self.party_ids[turn]}"
+                break
+            if isinstance(action, Accept) and (
+                last_offer is None or action.getBid() != last_offer.getBid()
+            ):
+                self.error = f"{action} does not accept the last offer {last_offer}"
+                break
+            if isinstance(action, Offer) and action.getBid() is None:
+                self.error = f"{action} does not contain a bid"
+                break
+            if not isinstance(action, (Offer, Accept, EndNegotiation)):
+                self.error = f"{action} is not allowed in SAOP"
+                break
+
+            self.log.append(action)
+            for party in self.parties:
+                self._deliver(party, ActionDone(action))
+
+            if isinstance(action, Accept):
+                self.agreement = action.getBid()
+                break
+            if isinstance(action, EndNegotiation):
+                break
+            if isinstance(action, Offer):
+                last_offer = action
+
+            turn = (turn + 1) % len(self.parties)
+
+        if self.agreement is None:
+            agreements = Agreements({})
+        else:
+            agreements = Agreements({i: self.agreement for i in self.party_ids})
+        # the outcome is final, a party that fails on Finished does not change it
+        self._finished = True
+        for party in self.parties:
+            self._deliver(party, Finished(agreements))
+
+    def getActions(self) -> List[Action]:
+        return self.log.getActions()
+
+    def to_dict(self) -> dict:
+        """Session results in the same layout as the serialised SAOPState of the
+        geniusweb Runner, as far as it is used to process the results.
+
+        Returns:
+            dict: session results
+        """
+        return {
+            "actions": self.log.to_dicts(),
+            "connections": [str(party_id) for party_id in self.party_ids],
+            "partyprofiles": {
+                str(party_id): {
+                    "party": {
+                        "partyref": f"pythonpath:{agent['class']}",
+                        "parameters": agent.get("parameters", {}),
+                    },
+                    "profile": profile_uri,
+                }
+                for party_id, agent, profile_uri in zip(
+                    self.party_ids, self.agents, self.profiles_uri
+                )
+            },
+            "progress": {
+                "ProgressTime": {
+                    "duration": self.deadline_time_ms,
+                    "start": int(self.clock.get_start().timestamp() * 1000),
+                }
+            },
+            "error": self.error,
+        }
+
+    def _past_deadline(self) -> bool:
+        return self.progress.isPastDeadline(int(self.clock.now_ms()))
+
+    def _deliver(self, party: DefaultParty, info: Inform):
+        start = perf_counter()
+        try:
+            party.notifyChange(info)
+        except Exception as e:
+            if self.error is None and not self._finished:
+                self.error = f"{type(party).__name__} failed to handle {info}: {e!r}"
+        self.clock.spend((perf_counter() - start) * 1000)
+
+    def _receive(self, party_id: PartyId, action: Action):
+        if self._finished:
+            # the session is over, late actions are ignored
+            return
+        if party_id != self._turn:
+            if self.error is None:
+                self.error = f"{party_id} sent {action} outside of its turn"
+            return
+        if self._received is not None:
+            self.error = f"{party_id} sent more than one action in a turn"
+        self._received = action
+
+
+class ActionLog:
+    """Compact record of the actions in a session. Every action is stored as an
+    action type code, the position of the actor and a reference to the bid.
+
+    Args:
+        party_ids (list[PartyId]): ids of the parties in the session
+    """
+
+    ACTION_TYPES = (Offer, Accept, EndNegotiation)
+
+    def __init__(self, party_ids: List[PartyId]):
+        self.party_ids = party_ids
+        self.types = bytearray()
+        self.actors = bytearray()
+        self.bids: List[Bid] = []
+
+    def append(self, action: Action):
+        action_type = next(
+            i for i, t in enumerate(self.ACTION_TYPES) if isinstance(action, t)
+        )
+        self.types.append(action_type)
+        self.actors.append(self.party_ids.index(action.getActor()))
+        self.bids.append(None if isinstance(action, EndNegotiation) else action.getBid())
+
+    def getActions(self) -> List[Action]:
+        actions = []
+        for action_type, actor, bid in zip(self.types, self.actors, self.bids):
+            action_class = self.ACTION_TYPES[action_type]
+            if action_class is EndNegotiation:
+                actions.append(EndNegotiation(self.party_ids[actor]))
+            else:
+                actions.append(action_class(self.party_ids[actor], bid))
+        return actions
+
+    def to_dicts(self) -> List[dict]:
+        """Actions as dictionaries in the JSON layout of geniusweb.
+
+        Returns:
+            list[dict]: list of actions
+        """
+        return [action_to_dict(action) for action in self.getActions()]
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+
+def action_to_dict(action: Action) -> dict:
+    """Convert an action to a dictionary in the JSON layout of geniusweb, without the
+    overhead of the ObjectMapper.
+
+    Args:
+        action (Action): Offer, Accept or EndNegotiation action
+
+    Returns:
+        dict: action dictionary, e.g. {"Offer": {"actor": ..., "bid": {"issuevalues": ...}}}
+    """
+    action_dict = {"actor": action.getActor().getName()}
+    if not isinstance(action, EndNegotiation):
+        action_dict["bid"] = {
+            "issuevalues": {
+                issue: _value_to_json(value.getValue())
+                for issue, value in action.getBid().getIssueValues().items()
+            }
+        }
+    return {type(action).__name__: action_dict}
+
+
+def _value_to_json(value):
+    # number values hold a Decimal, discrete values a string
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+class _DirectConnection:
+    """Connection end that is handed to a party. Actions that the party sends are
+    passed straight to the engine.
+    """
+
+    def __init__(self, party_id: PartyId, engine: SAOPEngine):
+        self._party_id = party_id
+        self._engine = engine
+        self._listeners = []
+
+    def send(self, data: Action):
+        self._engine._receive(self._party_id, data)
+
+    def addListener(self, listener):
+        self._listeners.append(listener)
+
+    def removeListener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def getReference(self):
+        return None
+
+    def getRemoteURI(self):
+        return None
+
+    def getError(self):
+        return None
+
+    def close(self):
+        pass
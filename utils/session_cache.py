@@ -0,0 +1,207 @@
+import ast
+import hashlib
+import json
+import os
+from functools import lru_cache
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Set
+
+
+class SessionCache:
+    """Content-addressed cache of session result summaries. A session is identified by
+    a hash over the source code of the agents (their complete module directory and all
+    modules of the repository that they import, see `hash_agent_source`), the contents
+    of the profiles and the remaining session settings. Changing a single agent
+    therefore only invalidates the sessions that this agent takes part in, changing
+    shared code invalidates the sessions of all agents that use it.
+
+    Args:
+        cache_dir (str): directory to store the cached summaries in
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+
+    def key(self, settings: dict) -> str:
+        """Hash that identifies the inputs of a session.
+
+        Args:
+            settings (dict): session settings
+
+        Returns:
+            str: hexadecimal SHA-256 hash
+        """
+        inputs = {k: v for k, v in settings.items() if k not in ("agents", "profiles")}
+        inputs["agents"] = [
+            {
+                "class": agent["class"],
+                "parameters": agent.get("parameters", {}),
+                "source": hash_agent_source(agent["class"]),
+            }
+            for agent in settings["agents"]
+        ]
+        inputs["profiles"] = [hash_file(profile) for profile in settings["profiles"]]
+
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    def get(self, settings: dict) -> dict:
+        path = self._path(self.key(settings))
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, settings: dict, summary: dict):
+        path = self._path(self.key(settings))
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # write to a temporary file first, so that an interrupted write never leaves a corrupt entry
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(summary))
+        os.replace(tmp_path, path)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir.joinpath(key[:2], f"{key}.json")
+
+
+@lru_cache(maxsize=None)
+def hash_agent_source(agent_class: str) -> str:
+    """Hash over the source code of an agent: its module directory and every module
+    of the repository that the agent module (directly or indirectly) imports, such
+    as a base class or shared utilities in another package. The hash is computed
+    once per agent class per process.
+
+    Args:
+        agent_class (str): classpath of the agent, e.g. "agents.boulware_agent.boulware_agent.BoulwareAgent"
+
+    Returns:
+        str: hexadecimal SHA-256 hash
+    """
+    module_name = agent_class.rsplit(".", 1)[0]
+    module_file = _module_file(module_name)
+    # the repository root is the directory that holds the top-level package
+    root = module_file.parents[len(module_name.split(".")) - 1]
+    if module_file.name == "__init__.py":
+        root = root.parent
+
+    digest = hashlib.sha256()
+    digest.update(hash_directory(agent_directory(agent_class)).encode())
+    for path in sorted(imported_source_files(module_name, root)):
+        digest.update(path.relative_to(root).as_posix().encode())
+        digest.update(hash_file(path).encode())
+
+    return digest.hexdigest()
+
+
+def imported_source_files(module_name: str, root: Path) -> Set[Path]:
+    """Source files of a module and of all modules within a root directory that it
+    imports, recursively. Imports are found statically (including imports within
+    functions), modules outside the root directory are ignored.
+
+    Args:
+        module_name (str): name of the module, e.g. "agents.boulware_agent.boulware_agent"
+        root (Path): root directory of the repository
+
+    Returns:
+        set[Path]: source files of the imported modules, including their packages
+    """
+    source_files = set()
+    pending = [module_name]
+    while pending:
+        name = pending.pop()
+        path = _repository_file(name, root)
+        if path is None or path in source_files:
+            continue
+        source_files.add(path)
+
+        # the package of a module is imported with it
+        if "." in name:
+            pending.append(name.rsplit(".", 1)[0])
+
+        package = name if path.name == "__init__.py" else name.rpartition(".")[0]
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), filename=str(path))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                if node.level > 0:
+                    base = package.split(".")[: len(package.split(".")) - node.level + 1]
+                    base = ".".join(base + ([node.module] if node.module else []))
+                else:
+                    base = node.module
+                pending.append(base)
+                # the imported names can be submodules as well
+                pending.extend(f"{base}.{alias.name}" for alias in node.names)
+
+    return source_files
+
+
+def _repository_file(module_name: str, root: Path) -> Path:
+    # source file of a module within the root directory, None for other modules
+    path = root.joinpath(*module_name.split("."))
+    if path.with_suffix(".py").is_file():
+        return path.with_suffix(".py")
+    if path.joinpath("__init__.py").is_file():
+        return path.joinpath("__init__.py")
+    return None
+
+
+def _module_file(module_name: str) -> Path:
+    module_path = Path(*module_name.split(".")).with_suffix(".py")
+    if module_path.exists():
+        return module_path.resolve()
+
+    # fall back to the import system for modules that are not relative to the working directory
+    return Path(find_spec(module_name).origin).resolve()
+
+
+def agent_directory(agent_class: str) -> Path:
+    """Directory that contains the module of an agent class.
+
+    Args:
+        agent_class (str): classpath of the agent, e.g. "agents.CSE3210.agent55.agent55.Agent55"
+
+    Returns:
+        Path: directory of the agent module
+    """
+    module_name = agent_class.rsplit(".", 1)[0]
+    module_path = Path(*module_name.split(".")).with_suffix(".py")
+    if module_path.exists():
+        return module_path.parent
+
+    # fall back to the import system for modules that are not relative to the working directory
+    return Path(find_spec(module_name).origin).parent
+
+
+@lru_cache(maxsize=None)
+def hash_directory(directory: Path) -> str:
+    """Hash over the relative paths and contents of all files in a directory tree.
+    Compiled Python files are ignored. The hash is computed once per directory per
+    process.
+
+    Args:
+        directory (Path): directory to hash
+
+    Returns:
+        str: hexadecimal SHA-256 hash
+    """
+    digest = hashlib.sha256()
+    for path in sorted(Path(directory).rglob("*")):
+        if not path.is_file() or "__pycache__" in path.parts or path.suffix == ".pyc":
+            continue
+        digest.update(path.relative_to(directory).as_posix().encode())
+        digest.update(hash_file(path).encode())
+
+    return digest.hexdigest()
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
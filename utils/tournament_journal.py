@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+
+
+class TournamentJournal:
+    """Append-only log of finished tournament sessions. Every session summary is
+    written as one JSON line as soon as the session has finished, so an interrupted
+    tournament can be resumed by skipping the sessions that are already in the journal.
+
+    Args:
+        path (str): path of the JSONL journal file
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.sessions = {}
+
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # last line can be incomplete if the tournament was killed while writing
+                        continue
+                    self.sessions[entry["key"]] = entry["summary"]
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._file = open(self.path, "a", encoding="utf-8")
+        # terminate an incomplete last line, so that new entries start on a line of their own
+        if self._file.tell() > 0:
+            with open(self.path, "rb") as f:
+                f.seek(-1, 2)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+
+    @staticmethod
+    def key(settings: dict) -> str:
+        """Key that identifies a session by its agent pair, profile set and deadline.
+
+        Args:
+            settings (dict): session settings
+
+        Returns:
+            str: session key
+        """
+        return json.dumps(
+            [settings["agents"], settings["profiles"], settings["deadline_time_ms"]],
+            sort_keys=True,
+        )
+
+    def __contains__(self, settings: dict) -> bool:
+        return self.key(settings) in self.sessions
+
+    def get(self, settings: dict) -> dict:
+        return self.sessions[self.key(settings)]
+
+    def append(self, settings: dict, summary: dict):
+        key = self.key(settings)
+        self.sessions[key] = summary
+        self._file.write(json.dumps({"key": key, "summary": summary}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
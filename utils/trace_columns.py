@@ -0,0 +1,165 @@
+import json
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+
+# action types in the order of their codes in the compact format
+ACTION_TYPES = ("Offer", "Accept", "EndNegotiation")
+
+
+def save_traces(path: str, traces: List[dict]):
+    """Save session traces in a compact columnar format (compressed .npz). Bids are
+    stored as value indices against the issuesValues ordering of their domain, actors
+    and action types as small integer codes and utilities as a float matrix. Any
+    number of sessions can be stored in one file, every domain is stored only once.
+
+    Args:
+        path (str): path of the .npz file
+        traces (list[dict]): session traces in the dict layout of `run_session`
+    """
+    sessions, domains, domain_ids = [], [], {}
+    action_types, actors, bids, utilities = [], [], [], []
+    session_offsets = [0]
+
+    for trace in traces:
+        issues_values = _get_issues_values(trace)
+        issues = list(issues_values.keys())
+        value_indices = [
+            {v: j for j, v in enumerate(issues_values[issue]["values"])} for issue in issues
+        ]
+        connections = trace["connections"]
+
+        for action in trace["actions"]:
+            action_type, content = next(iter(action.items()))
+            action_types.append(ACTION_TYPES.index(action_type))
+            actors.append(connections.index(content["actor"]))
+            if "bid" in content:
+                issuevalues = content["bid"]["issuevalues"]
+                bids.append(
+                    [value_indices[i][issuevalues[issue]] for i, issue in enumerate(issues)]
+                )
+            else:
+                bids.append([])
+            if "utilities" in content:
+                utilities.append([content["utilities"][c] for c in connections])
+            else:
+                utilities.append([np.nan] * len(connections))
+        session_offsets.append(len(action_types))
+
+        domain_key = json.dumps(issues_values)
+        if domain_key not in domain_ids:
+            domain_ids[domain_key] = len(domains)
+            domains.append(issues_values)
+        session = {k: v for k, v in trace.items() if k != "actions"}
+        sessions.append({"session": session, "domain": domain_ids[domain_key]})
+
+    # pad bids of different domains (and actions without a bid) with -1
+    num_issues = max([len(bid) for bid in bids], default=0)
+    max_values = max(
+        [len(v["values"]) for d in domains for v in d.values()], default=0
+    )
+    bid_matrix = np.full(
+        (len(bids), num_issues), -1, dtype=np.int8 if max_values <= 127 else np.int16
+    )
+    for row, bid in enumerate(bids):
+        bid_matrix[row, : len(bid)] = bid
+
+    num_parties = max([len(u) for u in utilities], default=0)
+    utility_matrix = np.full((len(utilities), num_parties), np.nan)
+    for row, bid_utilities in enumerate(utilities):
+        utility_matrix[row, : len(bid_utilities)] = bid_utilities
+
+    np.savez_compressed(
+        path,
+        sessions=np.array(json.dumps(sessions)),
+        domains=np.array(json.dumps(domains)),
+        session_offsets=np.array(session_offsets, dtype=np.int64),
+        action_types=np.array(action_types, dtype=np.int8),
+        actors=np.array(actors, dtype=np.int8),
+        bids=bid_matrix,
+        utilities=utility_matrix,
+    )
+
+
+def load_trace_arrays(path: str) -> dict:
+    """Load the arrays of a compact trace file, e.g. for analysis with NumPy/pandas.
+
+    Args:
+        path (str): path of the .npz file
+
+    Returns:
+        dict: "sessions" (list of session information and the index of their domain),
+            "domains" (issuesValues of every domain), "session_offsets",
+            "action_types", "actors", "bids" and "utilities"
+    """
+    with np.load(path) as data:
+        arrays = {k: data[k] for k in data.files}
+    arrays["sessions"] = json.loads(str(arrays["sessions"]))
+
+    # files written before the domains were stored once hold the domain of every session
+    if "domains" in arrays:
+        arrays["domains"] = json.loads(str(arrays["domains"]))
+    else:
+        arrays["domains"] = [session.pop("issuesValues") for session in arrays["sessions"]]
+        for d, session in enumerate(arrays["sessions"]):
+            session["domain"] = d
+
+    return arrays
+
+
+def load_traces(path: str) -> List[dict]:
+    """Load session traces from a compact trace file and convert them back to the dict
+    layout of `run_session`.
+
+    Args:
+        path (str): path of the .npz file
+
+    Returns:
+        list[dict]: session traces
+    """
+    arrays = load_trace_arrays(path)
+    offsets = arrays["session_offsets"]
+    action_types = arrays["action_types"].tolist()
+    actors = arrays["actors"].tolist()
+    bids = arrays["bids"].tolist()
+    utilities = arrays["utilities"].tolist()
+
+    traces = []
+    for s, session in enumerate(arrays["sessions"]):
+        trace = dict(session["session"])
+        issues_values = arrays["domains"][session["domain"]]
+        issues = list(issues_values.keys())
+        connections = trace["connections"]
+
+        actions = []
+        for row in range(offsets[s], offsets[s + 1]):
+            content = {"actor": connections[actors[row]]}
+            if bids[row] and bids[row][0] >= 0:
+                content["bid"] = {
+                    "issuevalues": {
+                        issue: issues_values[issue]["values"][j]
+                        for issue, j in zip(issues, bids[row])
+                    }
+                }
+            if not np.isnan(utilities[row][0]):
+                content["utilities"] = dict(zip(connections, utilities[row]))
+            actions.append({ACTION_TYPES[action_types[row]]: content})
+        trace["actions"] = actions
+        traces.append(trace)
+
+    return traces
+
+
+def _get_issues_values(trace: dict) -> dict:
+    # the domain is read from the profile of the first party
+    profile_uri = next(iter(trace["partyprofiles"].values()))["profile"]
+    return _load_issues_values(profile_uri.split(":", 1)[-1])
+
+
+@lru_cache(maxsize=None)
+def _load_issues_values(profile_file: str) -> dict:
+    with open(profile_file, "r", encoding="utf-8") as f:
+        profile = json.load(f)
+
+    return profile["LinearAdditiveUtilitySpace"]["domain"]["issuesValues"]
@@ -0,0 +1,127 @@
+import json
+import os
+from itertools import islice
+from typing import Iterator, List
+
+from geniusweb.actions.Action import Action
+
+from utils.profile_cache import get_profile
+from utils.saop_engine import action_to_dict
+from utils.utility_evaluator import UtilityEvaluator, verify_utilities
+
+
+def write_trace(
+    trace_file: str,
+    actions: List[Action],
+    party_ids: List[str],
+    agents: List[dict],
+    profiles_uri: List[str],
+    error: str = None,
+    chunk_size: int = 10000,
+    verify: bool = False,
+):
+    """Stream the trace of a session to a JSONL file. The first line holds the session
+    information, followed by one line per action (including the utilities of the bid
+    for both agents) and a last line with the error of the session. Actions are
+    converted and annotated in chunks, so the complete trace is never held in memory.
+
+    Args:
+        trace_file (str): path of the JSONL file to write
+        actions (list[Action]): actions of the session
+        party_ids (list[str]): party ids of the agents, in the same order as `agents`
+        agents (list[dict]): agent settings of the session
+        profiles_uri (list[str]): profile URIs of the agents
+        error (str, optional): error of the session. Defaults to None.
+        chunk_size (int, optional): number of actions to convert at once. Defaults to 10000.
+        verify (bool, optional): verify the utilities against the Decimal utilities of
+            geniusweb, see `verify_utilities`. Defaults to False.
+    """
+    session = {
+        "connections": party_ids,
+        "partyprofiles": {
+            party_id: {
+                "party": {
+                    "partyref": f"pythonpath:{agent['class']}",
+                    "parameters": agent.get("parameters", {}),
+                },
+                "profile": profile_uri,
+            }
+            for party_id, agent, profile_uri in zip(party_ids, agents, profiles_uri)
+        },
+    }
+    utility_funcs = {
+        party_id: get_profile(uri) for party_id, uri in zip(party_ids, profiles_uri)
+    }
+    evaluator = UtilityEvaluator(list(utility_funcs.values()))
+
+    with open(trace_file, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"session": session}) + "\n")
+
+        actions_iter = iter(actions)
+        while True:
+            chunk_actions = list(islice(actions_iter, chunk_size))
+            if not chunk_actions:
+                break
+            chunk = [action_to_dict(action) for action in chunk_actions]
+
+            # annotate all bids in the chunk with the utilities of both agents
+            offers, bids = [], []
+            for action, action_dict in zip(chunk_actions, chunk):
+                offer = next(iter(action_dict.values()))
+                if "bid" in offer:
+                    offers.append(offer)
+                    bids.append(action.getBid())
+            bid_matrix = evaluator.encode([offer["bid"]["issuevalues"] for offer in offers])
+            utilities = evaluator.utilities(bid_matrix).tolist()
+            for offer, bid_utilities in zip(offers, utilities):
+                offer["utilities"] = dict(zip(party_ids, bid_utilities))
+            if verify:
+                verify_utilities(offers, bids, utility_funcs)
+
+            f.write("".join(json.dumps(action) + "\n" for action in chunk))
+
+        f.write(json.dumps({"error": error}) + "\n")
+
+
+def read_trace(trace_file: str) -> dict:
+    """Open a trace that was written by `write_trace`. The session information and
+    error are read directly, the actions are read lazily from the file when they are
+    iterated.
+
+    Args:
+        trace_file (str): path of the JSONL file
+
+    Returns:
+        dict: trace with "connections", "partyprofiles", "error" and an iterator over
+            the "actions"
+    """
+    with open(trace_file, "r", encoding="utf-8") as f:
+        trace = json.loads(f.readline())["session"]
+
+    # the error is on the last line, read it without going through the whole file
+    with open(trace_file, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        # start before the newline that terminates the last line
+        position = f.tell() - 1
+        while position > 0:
+            f.seek(position - 1)
+            if f.read(1) == b"\n":
+                break
+            position -= 1
+        f.seek(position)
+        trace["error"] = json.loads(f.readline())["error"]
+
+    trace["actions"] = _iter_actions(trace_file)
+
+    return trace
+
+
+def _iter_actions(trace_file: str) -> Iterator[dict]:
+    with open(trace_file, "r", encoding="utf-8") as f:
+        # skip the session information
+        f.readline()
+        for line in f:
+            action = json.loads(line)
+            if "error" in action:
+                return
+            yield action
@@ -0,0 +1,87 @@
+from typing import Dict, List
+
+import numpy as np
+from geniusweb.issuevalue.Bid import Bid
+from geniusweb.profile.utilityspace.LinearAdditiveUtilitySpace import (
+    LinearAdditiveUtilitySpace,
+)
+
+from agents.utils.compiled_utility_space import CompiledUtilitySpace
+
+
+class UtilityEvaluator:
+    """Evaluator for one or more LinearAdditiveUtilitySpace profiles over the same
+    domain. Every profile is compiled by the CompiledUtilitySpace that the agents use,
+    and their tables are stacked, so that the utilities of many bids for all profiles
+    are computed in one NumPy operation. Bids are encoded from the dictionaries of the
+    session results (value strings) instead of Bid objects.
+
+    Args:
+        profiles (list[LinearAdditiveUtilitySpace]): profiles over the same domain
+    """
+
+    def __init__(self, profiles: List[LinearAdditiveUtilitySpace]):
+        compiled = [CompiledUtilitySpace(profile) for profile in profiles]
+        self.issues = compiled[0].issues
+        self.value_indices = [
+            {value.getValue(): j for j, value in enumerate(issue_values)}
+            for issue_values in compiled[0].values
+        ]
+        self.tables = np.stack([c.table for c in compiled])
+
+    def encode(self, bids: List[Dict[str, str]]) -> np.ndarray:
+        """Encode bids as a matrix of value indices, in the layout of
+        `CompiledUtilitySpace.encode_many`.
+
+        Args:
+            bids (list[dict[str, str]]): bids as dictionaries of issue to value, as they
+                are stored in the session results
+
+        Returns:
+            np.ndarray: integer matrix of shape (number of bids, number of issues)
+        """
+        bid_matrix = np.empty((len(bids), len(self.issues)), dtype=np.int32)
+        for i, (issue, value_index) in enumerate(zip(self.issues, self.value_indices)):
+            bid_matrix[:, i] = [value_index[bid[issue]] for bid in bids]
+
+        return bid_matrix
+
+    def utilities(self, bid_matrix: np.ndarray) -> np.ndarray:
+        """Utilities of encoded bids for all profiles.
+
+        Args:
+            bid_matrix (np.ndarray): integer matrix of value indices, see `encode`
+
+        Returns:
+            np.ndarray: float matrix of shape (number of bids, number of profiles)
+        """
+        issue_range = np.arange(len(self.issues))
+        return self.tables[:, issue_range, bid_matrix].sum(axis=2).T
+
+
+def verify_utilities(
+    offers: List[dict],
+    bids: List[Bid],
+    utility_funcs: Dict[str, LinearAdditiveUtilitySpace],
+    tolerance: float = 1e-9,
+):
+    """Verify the compiled utilities of offers against the (slow) Decimal utilities of
+    geniusweb, which then replace the compiled utilities.
+
+    Args:
+        offers (list[dict]): offers of a trace, annotated with "utilities" per party
+        bids (list[Bid]): bid of every offer
+        utility_funcs (dict[str, LinearAdditiveUtilitySpace]): profile of every party
+        tolerance (float, optional): maximum difference. Defaults to 1e-9.
+
+    Raises:
+        ValueError: if a compiled utility differs more than the tolerance
+    """
+    for offer, bid in zip(offers, bids):
+        for k, v in utility_funcs.items():
+            utility = float(v.getUtility(bid))
+            if abs(utility - offer["utilities"][k]) > tolerance:
+                raise ValueError(
+                    f"Compiled utility {offer['utilities'][k]} of {k} does not match {utility} for {bid}"
+                )
+            offer["utilities"][k] = utility
@@ -0,0 +1,103 @@
+from datetime import datetime
+from time import time
+
+from geniusweb.progress.ProgressTime import ProgressTime
+
+
+class WallClock:
+    """Clock that follows the real time. Sessions on this clock are bound by the
+    wall-clock deadline, just like sessions that are run by the geniusweb Runner.
+    """
+
+    def __init__(self):
+        self._start_ms = int(time() * 1000)
+
+    def spend(self, compute_ms: float):
+        pass
+
+    def end_turn(self):
+        pass
+
+    def elapsed_ms(self) -> float:
+        return self.now_ms() - self._start_ms
+
+    def now_ms(self) -> float:
+        return time() * 1000
+
+    def get_start(self) -> datetime:
+        return datetime.fromtimestamp(self._start_ms / 1000)
+
+    def create_progress(self, duration: int) -> ProgressTime:
+        return ProgressTime(duration, self.get_start())
+
+
+class VirtualClock:
+    """Simulated clock for negotiation sessions. Time only passes when the protocol
+    advances the clock, so a session takes as long as the agents need to compute
+    their actions instead of the full wall-clock deadline.
+
+    Args:
+        turn_cost_ms (float, optional): virtual time that every turn costs on top of
+            the measured compute time. Defaults to 1.0.
+        measure_compute (bool, optional): add the measured compute time of the agents to
+            the clock. Set to False for a fully deterministic clock that only advances
+            by `turn_cost_ms`. Defaults to True.
+
+    Raises:
+        ValueError: if the clock would never advance (no compute time is measured and
+            turns cost no time), since a session on such a clock never reaches its deadline
+    """
+
+    def __init__(self, turn_cost_ms: float = 1.0, measure_compute: bool = True):
+        if not measure_compute and turn_cost_ms <= 0:
+            raise ValueError(
+                f"turn_cost_ms must be positive when measure_compute is False, got {turn_cost_ms}"
+            )
+        self.turn_cost_ms = turn_cost_ms
+        self.measure_compute = measure_compute
+        self._start_ms = int(time() * 1000)
+        self._elapsed_ms = 0.0
+
+    def spend(self, compute_ms: float):
+        """Register time that an agent spent computing.
+
+        Args:
+            compute_ms (float): measured compute time in milliseconds
+        """
+        if self.measure_compute:
+            self._elapsed_ms += compute_ms
+
+    def end_turn(self):
+        """Advance the clock with the fixed cost of a turn."""
+        self._elapsed_ms += self.turn_cost_ms
+
+    def elapsed_ms(self) -> float:
+        return self._elapsed_ms
+
+    def now_ms(self) -> float:
+        return self._start_ms + self._elapsed_ms
+
+    def get_start(self) -> datetime:
+        return datetime.fromtimestamp(self._start_ms / 1000)
+
+    def create_progress(self, duration: int) -> ProgressTime:
+        return VirtualProgressTime(duration, self)
+
+
+class VirtualProgressTime(ProgressTime):
+    """ProgressTime that is driven by a VirtualClock. Agents keep calling
+    `progress.get(time() * 1000)`, the wall-clock time they pass is ignored and
+    replaced by the time of the virtual clock.
+    """
+
+    def __init__(self, duration: int, clock: VirtualClock):
+        super().__init__(duration, clock.get_start())
+        self._deadline_ms = duration
+        self._clock = clock
+
+    def get(self, currentTimeMs: int) -> float:
+        ratio = self._clock.elapsed_ms() / self._deadline_ms
+        return min(max(ratio, 0.0), 1.0)
+
+    def isPastDeadline(self, currentTimeMs: int) -> bool:
+        return self._clock.elapsed_ms() > self._deadline_ms